@@ -0,0 +1,297 @@
+"""Headless benchmarks for the load, All Columns counting, add_row and export paths.
+
+Examples:
+    python -m benchmark run --sizes 10000 100000 1000000 --output bench.json
+    python -m benchmark run --output new.json --baseline bench.json
+    python -m benchmark compare bench.json new.json --threshold 0.3
+    python -m benchmark generate data.csv --rows 1000000 --width 50 --cardinality 100
+
+`run` writes each size's synthetic CSV to a temporary directory and times
+every operation on it (best of --repeat runs). Memory is measured in a fresh
+process per operation as the growth of its peak resident set size over what
+the setup used ("peak_bytes"), so native allocations such as Arrow's count
+too; the tracemalloc peak of Python allocations is kept as "traced_bytes".
+`compare` flags operations that got slower or hungrier than the threshold
+allows and exits with status 1.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from engine import HAS_PYARROW, AnalysisEngine, compute_top_values, format_bytes, peak_memory_bytes
+
+DTYPES = ("int", "float", "str", "date", "bool")
+
+
+def synthetic_frame(rows, width=20, cardinality=1000, dtypes=DTYPES, seed=0):
+    """A DataFrame of `width` columns cycling through `dtypes`, each drawing
+    from about `cardinality` distinct values."""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for i in range(width):
+        dtype = dtypes[i % len(dtypes)]
+        codes = rng.integers(0, cardinality, rows)
+        if dtype == "int":
+            values = codes
+        elif dtype == "float":
+            values = np.round(codes * 0.37 + rng.random(rows) / cardinality, 3)
+        elif dtype == "str":
+            values = np.array([f"v{i}_{code}" for code in range(cardinality)], dtype=object)[codes]
+        elif dtype == "date":
+            values = pd.Timestamp("2020-01-01") + pd.to_timedelta(codes, unit="D")
+        elif dtype == "bool":
+            values = codes % 2 == 0
+        else:
+            raise ValueError(f"Unknown dtype '{dtype}'; choose from {', '.join(DTYPES)}.")
+        columns[f"{dtype}_{i}"] = values
+    return pd.DataFrame(columns)
+
+
+def generate_csv(path, rows, width=20, cardinality=1000, dtypes=DTYPES, seed=0, chunk_rows=500_000):
+    """Writes a synthetic CSV in chunks, so files larger than memory can be
+    generated; returns its size in bytes."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for start in range(0, max(rows, 1), chunk_rows):
+            chunk = synthetic_frame(min(chunk_rows, rows - start), width, cardinality, dtypes, seed + start)
+            chunk.to_csv(f, index=False, header=start == 0)
+    return os.path.getsize(path)
+
+
+def _operations(path, tmp_dir):
+    """(name, setup, run) triples; setup() builds what run(state) needs
+    outside the timed region."""
+    def loaded():
+        engine = AnalysisEngine()
+        engine.load(path)
+        return engine
+
+    new_rows = [{col: "1" for col in pd.read_csv(path, nrows=0).columns}] * 1000
+
+    def add_rows(engine):
+        for row in new_rows:
+            engine.add_row(row)
+        engine.flush_pending_rows()
+
+    operations = [
+        ("load", lambda: None, lambda state: AnalysisEngine().load(path)),
+        ("load_compact", lambda: None, lambda state: AnalysisEngine().load(path, compact=True)),
+        ("count_all_columns", loaded, lambda engine: compute_top_values(engine.source, None, 10)),
+        ("add_row_x1000", loaded, add_rows),
+        ("export_csv", loaded, lambda engine: engine.export(os.path.join(tmp_dir, "export.csv"))),
+    ]
+    if HAS_PYARROW:
+        operations.append(("export_parquet", loaded,
+                           lambda engine: engine.export(os.path.join(tmp_dir, "export.parquet"))))
+    return operations
+
+
+def _peak_rss():
+    """Peak RSS of this process. On Linux VmHWM, which _reset_peak_rss can
+    lower; getrusage's ru_maxrss also keeps the peak of the parent it was
+    forked from."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return peak_memory_bytes()
+
+
+def _reset_peak_rss():
+    """Lowers the peak RSS to the current RSS where the OS allows it (Linux),
+    so memory freed after imports and setup doesn't hide the operation's own
+    peak."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_worker(path, tmp_dir, name, connection):
+    setup, run = {op: (setup, run) for op, setup, run in _operations(path, tmp_dir)}[name]
+    state = setup()
+    _reset_peak_rss()
+    before = _peak_rss()
+    run(state)
+    after = _peak_rss()
+    connection.send(None if before is None or after is None else after - before)
+    connection.close()
+
+
+def measure_peak_rss(path, tmp_dir, name):
+    """How far operation `name` raises the peak RSS of a fresh process above
+    its RSS after setup (above the setup's peak where the peak can't be
+    reset), or None where peak RSS can't be read."""
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_peak_rss_worker, args=(path, tmp_dir, name, sender))
+    process.start()
+    sender.close()
+    try:
+        return receiver.recv()
+    except EOFError:
+        raise RuntimeError(f"Operation '{name}' failed in the memory measurement process.") from None
+    finally:
+        process.join()
+
+
+def measure(setup, run, repeat=3):
+    """Best and median seconds over `repeat` runs, and the peak bytes of
+    Python allocations in one more run under tracemalloc."""
+    timings = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        timings.append(time.perf_counter() - start)
+    state = setup()
+    tracemalloc.start()
+    try:
+        run(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(timings), "seconds_median": float(np.median(timings)), "traced_bytes": peak}
+
+
+def run_suite(sizes, width=20, cardinality=1000, dtypes=DTYPES, repeat=3, operations=None, log=print):
+    """Runs every operation at every size; returns the JSON-ready report."""
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count(), "width": width,
+            "cardinality": cardinality, "dtypes": list(dtypes), "repeat": repeat,
+            "memory_metric": "peak_rss_growth",
+        },
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="csv_analyzer_bench_") as tmp_dir:
+        for rows in sizes:
+            path = os.path.join(tmp_dir, f"synthetic_{rows}.csv")
+            file_bytes = generate_csv(path, rows, width, cardinality, dtypes)
+            for name, setup, run in _operations(path, tmp_dir):
+                if operations and name not in operations:
+                    continue
+                result = {"operation": name, "rows": rows, "file_bytes": file_bytes, **measure(setup, run, repeat),
+                          "peak_bytes": measure_peak_rss(path, tmp_dir, name)}
+                report["results"].append(result)
+                peak = "n/a" if result["peak_bytes"] is None else format_bytes(result["peak_bytes"])
+                log(f"{name:>18} {rows:>12,} rows  {result['seconds']:9.4f} s  {peak:>10}")
+    return report
+
+
+def compare(baseline, current, threshold=0.20, min_seconds=0.005, min_bytes=1024 ** 2):
+    """Rows of (operation, rows, metric, before, after, change, regressed)
+    for every operation and size present in both reports. A change counts as
+    a regression when it exceeds `threshold` (relative) and is also more than
+    `min_seconds` or `min_bytes`. Memory is skipped when the reports measured
+    it differently (reports from before peak RSS was used hold tracemalloc
+    peaks)."""
+    metrics = ["seconds"]
+    if baseline["meta"].get("memory_metric") == current["meta"].get("memory_metric"):
+        metrics.append("peak_bytes")
+    before = {(r["operation"], r["rows"]): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        old = before.get((result["operation"], result["rows"]))
+        if old is None:
+            continue
+        for metric in metrics:
+            a, b = old[metric], result[metric]
+            if a is None or b is None:
+                continue
+            change = (b - a) / a if a else 0.0
+            regressed = change > threshold and b - a > (min_seconds if metric == "seconds" else min_bytes)
+            rows.append((result["operation"], result["rows"], metric, a, b, change, regressed))
+    return rows
+
+
+def format_comparison(rows):
+    lines = [f"{'operation':>18} {'rows':>12} {'metric':>10} {'before':>12} {'after':>12} {'change':>8}"]
+    for operation, n, metric, a, b, change, regressed in rows:
+        fmt = (lambda v: f"{v:.4f} s") if metric == "seconds" else format_bytes
+        lines.append(f"{operation:>18} {n:>12,} {metric:>10} {fmt(a):>12} {fmt(b):>12} {change:>+7.1%}"
+                     + ("  REGRESSION" if regressed else ""))
+    return "\n".join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="CSV Analyzer benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    data = argparse.ArgumentParser(add_help=False)
+    data.add_argument("--width", type=int, default=20, help="number of columns")
+    data.add_argument("--cardinality", type=int, default=1000, help="distinct values per column")
+    data.add_argument("--dtypes", nargs="+", choices=DTYPES, default=list(DTYPES),
+                      help="column types, cycled across the width")
+
+    run = commands.add_parser("run", parents=[data], help="time every operation across sizes")
+    run.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000], help="row counts")
+    run.add_argument("--repeat", type=int, default=3, help="timed runs per operation (the best is kept)")
+    run.add_argument("--operations", nargs="+", help="only run these operations")
+    run.add_argument("--output", default="benchmark_results.json", help="JSON file for the results")
+    run.add_argument("--baseline", help="earlier results to compare against")
+    run.add_argument("--threshold", type=float, default=0.20, help="relative change counted as a regression")
+
+    diff = commands.add_parser("compare", help="compare two result files and flag regressions")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument("--threshold", type=float, default=0.20, help="relative change counted as a regression")
+
+    generate = commands.add_parser("generate", parents=[data], help="write a synthetic CSV")
+    generate.add_argument("output")
+    generate.add_argument("--rows", type=int, default=100_000)
+    generate.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def _load_report(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    if options.command == "generate":
+        size = generate_csv(options.output, options.rows, options.width, options.cardinality,
+                            options.dtypes, options.seed)
+        print(f"Wrote {options.rows:,} rows ({format_bytes(size)}) to {options.output}")
+        return 0
+
+    if options.command == "run":
+        current = run_suite(options.sizes, options.width, options.cardinality, options.dtypes,
+                            options.repeat, options.operations)
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"Saved results to {options.output}")
+        if not options.baseline:
+            return 0
+        baseline = _load_report(options.baseline)
+    else:
+        baseline, current = _load_report(options.baseline), _load_report(options.current)
+
+    rows = compare(baseline, current, options.threshold)
+    print(format_comparison(rows))
+    regressions = sum(1 for row in rows if row[-1])
+    if regressions:
+        print(f"{regressions} regression(s) above {options.threshold:.0%}.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""Command-line entry point for running the CSV Analyzer engine headless.
+
+Examples:
+    python -m cli profile data.csv
+    python -m cli top shards/ --column city -n 20 --jobs 8
+    python -m cli groupby data.csv --by city --values price --agg sum mean p90
+    python -m cli export data.csv --filter "city == 'Paris' and price > 10" --to csv.gz
+    python -m cli chart data.csv --kind pie --column city --format svg --output-dir charts
+    python -m cli chart data.csv --kind timeseries --column price --time-column date
+    python -m cli export shards/ --to parquet --output-dir out --jobs 8
+    python -m cli top data.csv --trace --profile
+
+Inputs may be CSV files, glob patterns or directories (every *.csv inside is
+processed). With --jobs above 1 the files are processed in parallel by a
+process pool. --merge loads every input as one dataset instead, parsing the
+shards in parallel:
+    python -m cli top "daily/*.csv" --merge --source-column day --jobs 8
+
+--trace times the load and the command of each input and writes them as a
+Chrome trace, "<input>.<command>.trace.json"; --profile adds a cProfile of
+each step, saved as .prof files beside the trace.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+from engine import CHART_KINDS, GROUP_AGGREGATIONS, AnalysisEngine, ParsedCSVCache, expand_paths  # noqa: E402
+from tracing import operations  # noqa: E402
+
+EXPORT_FORMATS = ["csv", "csv.gz", "csv.bz2", "csv.xz", "parquet", "feather"]
+
+
+def output_path(file_path, output_dir, suffix):
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    directory = output_dir or os.path.dirname(os.path.abspath(file_path))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{stem}.{suffix}")
+
+
+def run_command(file_path, options):
+    """Loads one file (or, with --merge, the list of shards) and runs the
+    chosen command; returns a dict for printing."""
+    if options.trace:
+        operations.clear()
+        operations.profile = options.profile
+    engine = AnalysisEngine(csv_cache=ParsedCSVCache() if options.cache else None)
+    with operations.span("load") as span:
+        engine.load(file_path, compact=options.compact, out_of_core=options.out_of_core,
+                    source_column=options.source_column, jobs=options.jobs)
+        span.rows = engine.row_count()
+    engine.set_filter(options.filter)
+    if isinstance(file_path, list):
+        file_path = os.path.join(os.path.dirname(file_path[0]), "merged.csv")
+    result = {"file": file_path, "rows": len(engine.view), "columns": len(engine.columns())}
+    with operations.span(options.command, rows=result["rows"]):
+        _run_command(engine, file_path, options, result)
+    if options.trace:
+        result["trace"] = operations.export_trace(
+            output_path(file_path, getattr(options, "output_dir", None), f"{options.command}.trace.json"))[0]
+    return result
+
+
+def _run_command(engine, file_path, options, result):
+    if options.command == "profile":
+        result["profile"] = engine.profile()
+    elif options.command == "top":
+        counts = engine.top_values(options.column, n=options.n)
+        result["top"] = [[str(value), int(count)] for value, count in counts.items()]
+        result["approximate"] = bool(counts.attrs.get("approximate"))
+    elif options.command == "groupby":
+        table = engine.groupby(options.by, options.values, options.agg, pivot=options.pivot)
+        result["groupby"] = json.loads(table.reset_index().to_json(orient="records"))
+        result["table"] = table.to_string()
+    elif options.command == "chart":
+        fig = engine.chart(options.kind, options.column, time_col=options.time_column)
+        path = output_path(file_path, options.output_dir, f"{options.kind}.{options.format}")
+        fig.savefig(path, format=options.format)
+        result["output"] = path
+    elif options.command == "export":
+        path = output_path(file_path, options.output_dir, options.to)
+        if os.path.abspath(path) == os.path.abspath(file_path):
+            raise ValueError("Export would overwrite the input file; pass --output-dir.")
+        engine.export(path)
+        result["output"] = path
+
+
+def _run_safely(file_path, options):
+    try:
+        return run_command(file_path, options)
+    except Exception as e:
+        return {"file": file_path, "error": f"{type(e).__name__}: {e}"}
+
+
+def format_result(result):
+    if "error" in result:
+        return f"{result['file']}: ERROR {result['error']}"
+    lines = [f"{result['file']}: {result['rows']:,} rows, {result['columns']} columns"]
+    if "profile" in result:
+        for col, stats in result["profile"].items():
+            line = f"  {col}: {stats['dtype']}, {stats['count']:,} non-null, {stats['nulls']:,} nulls, ~{stats['distinct']:,} distinct"
+            if stats["mean"] is not None:
+                line += (f", min {stats['min']:g}, median ~{stats['p50']:g}, max {stats['max']:g}, "
+                         f"mean {stats['mean']:g}")
+            elif stats["min"] is not None:
+                line += f", {stats['min']} to {stats['max']}"
+            if stats["top"]:
+                line += ", top " + ", ".join(f"{value} ({count:,})" for value, count in stats["top"])
+            lines.append(line)
+    if "table" in result:
+        lines.extend("  " + line for line in result["table"].splitlines())
+    if "top" in result:
+        if result["approximate"]:
+            lines.append("  \u2248 approximate: too many distinct values to count exactly")
+        for value, count in result["top"]:
+            lines.append(f"  {count:>12,}  {value}")
+    if "output" in result:
+        lines.append(f"  wrote {result['output']}")
+    if "trace" in result:
+        lines.append(f"  trace {result['trace']}")
+    return "\n".join(lines)
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("inputs", nargs="+", help="CSV files or directories of CSV files")
+    common.add_argument("--compact", action="store_true", help="infer compact dtypes while loading")
+    common.add_argument("--out-of-core", action="store_true", help="stream files instead of loading them")
+    common.add_argument("--cache", action="store_true", help="use the parsed CSV cache")
+    common.add_argument("--jobs", type=int, default=1, help="number of files to process in parallel")
+    common.add_argument("--merge", action="store_true",
+                        help="treat all inputs as shards of one dataset, parsed in parallel and concatenated")
+    common.add_argument("--source-column", help="with --merge, name of a column recording each row's file")
+    common.add_argument("--filter", help="pandas query selecting the rows to use, e.g. \"city == 'Paris'\"")
+    common.add_argument("--json", action="store_true", help="print one JSON object per file")
+    common.add_argument("--trace", action="store_true", help="write a Chrome trace of each file's load and command")
+    common.add_argument("--profile", action="store_true", help="with --trace, also capture a cProfile of each step")
+
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Headless CSV Analyzer.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("profile", parents=[common], help="per-column counts, distinct estimate, range, quartiles and top values")
+
+    top = commands.add_parser("top", parents=[common], help="most frequent values")
+    top.add_argument("--column", help="column to count (default: all columns)")
+    top.add_argument("-n", type=int, default=10, help="number of values to show")
+
+    groupby = commands.add_parser("groupby", parents=[common], help="aggregate value columns by key columns")
+    groupby.add_argument("--by", nargs="+", required=True, help="key columns")
+    groupby.add_argument("--values", nargs="+", required=True, help="value columns")
+    groupby.add_argument("--agg", nargs="+", choices=GROUP_AGGREGATIONS, default=["count"])
+    groupby.add_argument("--pivot", action="store_true", help="move the last key into the columns")
+
+    chart = commands.add_parser("chart", parents=[common], help="render a chart to a file")
+    chart.add_argument("--kind", choices=CHART_KINDS, default="bar")
+    chart.add_argument("--column", help="column to chart (default: all columns, bar only)")
+    chart.add_argument("--time-column", help="date/time column for the timeseries x axis (default: row order)")
+    chart.add_argument("--format", choices=["png", "svg"], default="png")
+    chart.add_argument("--output-dir", help="directory for the charts (default: beside each input)")
+
+    export = commands.add_parser("export", parents=[common], help="re-export in another format")
+    export.add_argument("--to", choices=EXPORT_FORMATS, default="parquet")
+    export.add_argument("--output-dir", help="directory for the exports (default: beside each input)")
+    return parser
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    files = expand_paths(options.inputs)
+    if not files:
+        print("No CSV files found.", file=sys.stderr)
+        return 1
+    if options.merge:
+        files = [files]
+
+    failed = False
+    parallel = options.jobs > 1 and len(files) > 1
+    with (ProcessPoolExecutor(max_workers=options.jobs) if parallel else nullcontext()) as pool:
+        if pool is not None:
+            results = pool.map(_run_safely, files, [options] * len(files))
+        else:
+            results = (_run_safely(path, options) for path in files)
+        for result in results:
+            if options.json:
+                result.pop("table", None)
+                print(json.dumps(result), flush=True)
+            else:
+                print(format_result(result), flush=True)
+            failed = failed or "error" in result
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
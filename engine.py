@@ -0,0 +1,2070 @@
+"""Data operations shared by the Tk app (main.py) and the command line (cli.py).
+
+Nothing in this module imports tkinter or a GUI matplotlib backend, so it can
+run headless on a server or in a cron job.
+"""
+import ast
+import bz2
+import glob
+import gzip
+import hashlib
+import json
+import lzma
+import multiprocessing
+import os
+import queue
+import re
+import stat
+import sys
+import tempfile
+import threading
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from matplotlib.figure import Figure
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+def format_bytes(num_bytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024 or unit == "GB":
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
+
+def infer_compact_dtypes(sample, category_ratio=0.5):
+    """Picks read_csv `dtype`/`parse_dates` arguments from a sample of the file.
+
+    Only text columns are decided here. Numeric columns are downcast after the
+    whole column has been read, because a sample's min/max can't bound the rest
+    of the file.
+    """
+    dtype = {}
+    parse_dates = []
+    for col in sample.columns:
+        series = sample[col]
+        if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+            continue
+        values = series.dropna()
+        if values.empty:
+            continue
+        if values.astype(str).str.contains(r"\d[-/:]\d", regex=True).all():
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                parsed = pd.to_datetime(values, errors="coerce", format="mixed")
+            if parsed.notna().all():
+                parse_dates.append(col)
+                continue
+        if values.nunique() <= category_ratio * len(values):
+            dtype[col] = "category"
+        elif HAS_PYARROW:
+            dtype[col] = "string[pyarrow]"
+    return dtype, parse_dates
+
+
+def common_dtype(dtypes, has_missing):
+    """The dtype a column should take when frames with `dtypes` are stacked.
+
+    Numbers widen (ints become floats if some frame lacks the column),
+    categoricals stay categorical, and anything else mixed becomes object.
+    """
+    first = dtypes[0]
+    if all(dtype == first for dtype in dtypes) and not (has_missing and first.kind in "biu"):
+        return first
+    if all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+        return pd.CategoricalDtype()
+    if all(isinstance(dtype, np.dtype) and dtype.kind in "iuf" for dtype in dtypes):
+        target = np.result_type(*dtypes)
+        return np.dtype(np.float64) if has_missing and target.kind in "iu" else target
+    return np.dtype(object)
+
+
+def concat_frames(frames, source_names=None, source_column="source_file"):
+    """Concatenates frames once after reconciling their columns and dtypes.
+
+    Columns are the union of every frame's columns in first-seen order, and
+    each shard is cast at most once before the single pd.concat. With
+    `source_names` (one per frame), a categorical `source_column` records
+    which frame each row came from.
+    """
+    if len(frames) == 1 and source_names is None:
+        return frames[0]
+    columns = list(dict.fromkeys(col for frame in frames for col in frame.columns))
+    for col in columns:
+        present = [frame for frame in frames if col in frame.columns]
+        target = common_dtype([frame[col].dtype for frame in present], len(present) < len(frames))
+        if isinstance(target, pd.CategoricalDtype):
+            categories = union_categoricals([frame[col] for frame in present]).categories
+            for frame in present:
+                frame[col] = frame[col].cat.set_categories(categories)
+        else:
+            for frame in present:
+                if frame[col].dtype != target:
+                    frame[col] = frame[col].astype(target)
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    if source_names is not None:
+        while source_column in df.columns:
+            source_column = "_" + source_column
+        codes = np.repeat(np.arange(len(frames)), [len(frame) for frame in frames])
+        df[source_column] = pd.Categorical.from_codes(codes, categories=list(source_names))
+    return df
+
+
+_BOOL_TEXT = {"true": True, "false": False, "yes": True, "no": False, "1": True, "0": False}
+
+
+def conform_column(values, column):
+    """Casts typed-in `values` (NaN or "" where the user gave nothing) to
+    `column`'s dtype, so appending them doesn't turn the column into object.
+
+    Returns (values, column); `column` comes back with any new categories
+    added. Values that don't fit the dtype are left as they are, and the
+    concat then widens the column only as far as they need.
+    """
+    dtype = column.dtype
+    present = values.notna() & (values.astype(str).str.strip() != "")
+    if isinstance(dtype, pd.CategoricalDtype):
+        cast, _ = conform_column(values, pd.Series(dtype.categories))
+        new = pd.Index(cast[present].unique()).difference(dtype.categories)
+        try:
+            if len(new):
+                column = column.cat.add_categories(new)
+            return pd.Series(pd.Categorical(cast.where(present), dtype=column.dtype), index=values.index), column
+        except (TypeError, ValueError):
+            return values, column
+    if pd.api.types.is_bool_dtype(dtype):
+        flags = values.where(present).map(lambda value: _BOOL_TEXT.get(str(value).strip().lower()), na_action="ignore")
+        if flags[present].isna().any():
+            return values, column
+        return flags.astype(dtype if present.all() else "boolean"), column
+    if pd.api.types.is_numeric_dtype(dtype):
+        numbers = pd.to_numeric(values.where(present), errors="coerce")
+        if numbers[present].isna().any():
+            return values, column
+        try:
+            cast = numbers.astype(dtype)
+        except (TypeError, ValueError):
+            return numbers, column
+        lossless = np.array_equal(cast.to_numpy(np.float64, na_value=np.nan), numbers.to_numpy(np.float64),
+                                  equal_nan=True)
+        return (cast if lossless else numbers), column
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            stamps = pd.to_datetime(values.where(present), errors="coerce", format="mixed")
+        if stamps[present].isna().any():
+            return values, column
+        try:
+            return stamps.astype(dtype), column
+        except (TypeError, ValueError):
+            return stamps, column
+    try:
+        return values.astype(dtype), column
+    except (TypeError, ValueError):
+        return values, column
+
+
+def expand_paths(patterns):
+    """Expands directories (to their *.csv files) and glob patterns, keeping order."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.extend(sorted(glob.glob(os.path.join(pattern, "*.csv"))))
+        elif glob.has_magic(pattern):
+            files.extend(sorted(glob.glob(pattern)))
+        else:
+            files.append(pattern)
+    return files
+
+
+def downcast_numeric(df):
+    """Shrinks int and float columns in place to the smallest lossless dtype."""
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            kind = "unsigned" if len(series) and series.min() >= 0 else "integer"
+            df[col] = pd.to_numeric(series, downcast=kind)
+        elif pd.api.types.is_float_dtype(series) and series.dtype.itemsize > 4:
+            smaller = series.astype(np.float32)
+            if np.array_equal(smaller.to_numpy(np.float64), series.to_numpy(), equal_nan=True):
+                df[col] = smaller
+    return df
+
+
+class HeavyHitters:
+    """Misra-Gries summary of the most frequent keys, fed in weighted batches.
+
+    Holds at most `capacity` keys; each stored count underestimates the true
+    count by no more than total / (capacity + 1), and any key more frequent
+    than that is guaranteed to be kept.
+    """
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.total = 0
+        self.pruned = False
+
+    def update(self, counts):
+        """Merges a Series of unique key -> count into the summary."""
+        self.total += int(counts.sum())
+        merged = self.counts.add(counts, fill_value=0)
+        if len(merged) > self.capacity:
+            threshold = merged.nlargest(self.capacity + 1).iloc[-1]
+            merged = merged[merged > threshold] - threshold
+            self.pruned = True
+        self.counts = merged.astype(np.int64)
+
+
+def value_counts_as_text(series):
+    """value_counts keyed by the text form of each value, so columns of
+    different dtypes can be merged. Only distinct values are stringified."""
+    counts = series.value_counts(sort=False)
+    counts = counts[counts > 0]
+    counts.index = counts.index.astype(str)
+    if not counts.index.is_unique:
+        counts = counts.groupby(level=0, sort=False).sum()
+    return counts
+
+
+def top_values_across_columns(df, n=10, capacity=1000, max_keys=2_000_000):
+    """Most frequent values over every column, without building the full
+    value-by-column matrix. Counts are exact for the returned values."""
+    return top_values_across_chunks(lambda: [df], n=n, capacity=capacity, max_keys=max_keys)
+
+
+def top_values_across_chunks(make_chunks, n=10, capacity=1000, max_keys=2_000_000):
+    """top_values_across_columns over DataFrame chunks from `make_chunks()`.
+
+    The chunks are read a second time only if the summary had to prune, to
+    count its candidates exactly. The candidates are only guaranteed to hold
+    the top n when the n-th count is above the summary's error bound, total /
+    (capacity + 1); on flatter data every value is counted exactly in a third
+    pass, unless that needs more than `max_keys` distinct values. Then the
+    candidates' counts are returned with `attrs["approximate"]` set.
+    """
+    sketch = HeavyHitters(capacity)
+    for chunk in make_chunks():
+        for i in range(chunk.shape[1]):
+            sketch.update(value_counts_as_text(chunk.iloc[:, i]))
+    if not sketch.pruned:
+        return sketch.counts.sort_values(ascending=False, kind="stable").head(n)
+
+    candidates = sketch.counts.index
+    exact = pd.Series(0, index=candidates, dtype=np.int64)
+    for chunk in make_chunks():
+        for i in range(chunk.shape[1]):
+            exact += value_counts_as_text(chunk.iloc[:, i]).reindex(candidates, fill_value=0).astype(np.int64)
+    top = exact.sort_values(ascending=False, kind="stable").head(n)
+    if len(top) == n and top.iloc[-1] > sketch.total / (capacity + 1):
+        return top
+
+    counts = pd.Series(dtype=np.int64)
+    for chunk in make_chunks():
+        for i in range(chunk.shape[1]):
+            counts = counts.add(value_counts_as_text(chunk.iloc[:, i]), fill_value=0)
+            if len(counts) > max_keys:
+                top.attrs["approximate"] = True
+                return top
+    return counts.astype(np.int64).sort_values(ascending=False, kind="stable").head(n)
+
+
+class HyperLogLog:
+    """Distinct-count estimate from 64-bit hashes in 2**precision bytes.
+
+    The standard error is about 1.04 / sqrt(2**precision), 1.6% at the
+    default precision of 12.
+    """
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, hashes):
+        if not len(hashes):
+            return
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - p)) - 1)
+        high = (rest >> np.uint64(32)).astype(np.float64)
+        low = (rest & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        bit_length = np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+        rank = (64 - p + 1 - bit_length).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * np.log(m / zeros)
+        return raw
+
+
+class QuantileSketch:
+    """KLL-style compactor stack for approximate quantiles in bounded memory.
+
+    Each level holds at most `k` values; when one overflows it is sorted and
+    every other value (random offset) moves up a level with twice the weight.
+    """
+    def __init__(self, k=256, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compact()
+
+    def merge(self, other):
+        """Folds in the values of `other`, keeping their weights."""
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self._compact()
+
+    def _compact(self):
+        for level in range(len(self.levels)):
+            items = self.levels[level]
+            if len(items) <= self.k:
+                continue
+            items = np.sort(items)
+            self.levels[level] = items[len(items) - len(items) % 2:]
+            promoted = items[self._rng.integers(2):len(items) - len(items) % 2:2]
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+
+    def quantiles(self, qs):
+        values = np.concatenate(self.levels)
+        if not len(values):
+            return [None] * len(qs)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, np.asarray(qs) * cumulative[-1])
+        return [float(v) for v in values[order][np.minimum(positions, len(values) - 1)]]
+
+
+class ColumnProfiler:
+    """Mergeable single-pass summary of one column, fed in chunks.
+
+    Counts, min/max and mean/std (Chan's parallel update) are exact; distinct
+    count, quartiles and top values come from fixed-size sketches, so memory
+    does not grow with the number of rows.
+    """
+    def __init__(self, dtype, top_capacity=100):
+        self.dtype = dtype
+        self.count = 0
+        self.nulls = 0
+        self.distinct = HyperLogLog()
+        self.top = HeavyHitters(top_capacity)
+        self.quantile_sketch = None
+        self.minimum = None
+        self.maximum = None
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, series):
+        values = series.dropna()
+        self.count += len(values)
+        self.nulls += len(series) - len(values)
+        if values.empty:
+            return
+        self.distinct.update(pd.util.hash_pandas_object(values, index=False).to_numpy())
+        self.top.update(value_counts_as_text(values))
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            x = values.to_numpy(dtype=np.float64)
+            self._update_range(x.min(), x.max())
+            n_a, n_b = self.count - len(x), len(x)
+            mean_b = x.mean()
+            delta = mean_b - self.mean
+            self.m2 += ((x - mean_b) ** 2).sum() + delta ** 2 * n_a * n_b / self.count
+            self.mean += delta * n_b / self.count
+            if self.quantile_sketch is None:
+                self.quantile_sketch = QuantileSketch()
+            self.quantile_sketch.update(x)
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            self._update_range(values.min(), values.max())
+
+    def _update_range(self, low, high):
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+
+    def result(self):
+        """A JSON-friendly dict of the summary so far."""
+        numeric = self.quantile_sketch is not None
+        p25, p50, p75 = self.quantile_sketch.quantiles([0.25, 0.5, 0.75]) if numeric else (None, None, None)
+        as_value = (lambda v: float(v)) if numeric else str
+        top = self.top.counts.sort_values(ascending=False, kind="stable").head(3)
+        return {
+            "dtype": str(self.dtype),
+            "count": int(self.count),
+            "nulls": int(self.nulls),
+            "distinct": int(round(self.distinct.estimate())) if self.count else 0,
+            "min": as_value(self.minimum) if self.minimum is not None else None,
+            "max": as_value(self.maximum) if self.maximum is not None else None,
+            "mean": float(self.mean) if numeric else None,
+            "std": float(np.sqrt(self.m2 / (self.count - 1))) if numeric and self.count > 1 else None,
+            "p25": p25,
+            "p50": p50,
+            "p75": p75,
+            "top": [[value, int(count)] for value, count in top.items()],
+        }
+
+
+GROUP_AGGREGATIONS = ("count", "sum", "mean", "min", "max", "nunique", "median", "p25", "p75", "p90")
+QUANTILE_AGGREGATIONS = {"median": 0.5, "p25": 0.25, "p75": 0.75, "p90": 0.9}
+_MOMENT_MERGES = {"count": "sum", "sum": "sum", "min": "min", "max": "max"}
+
+
+def _categorical_keys(chunk, keys):
+    """Key columns as categoricals, so groupby works on integer codes."""
+    return [chunk[key] if isinstance(chunk[key].dtype, pd.CategoricalDtype) else chunk[key].astype("category")
+            for key in keys]
+
+
+class GroupAggregator:
+    """Mergeable partial group-by aggregation, fed one chunk at a time.
+
+    count, sum, min and max are kept per group and combine exactly (mean is
+    sum / count); nunique keeps each group's distinct values. Quantiles keep
+    a QuantileSketch per group when `sketch_quantiles` is set; otherwise the
+    caller computes them exactly and passes them to result(). Aggregators
+    built on different chunks (e.g. in worker threads) are combined with merge.
+    """
+    def __init__(self, keys, values, aggregations, sketch_quantiles=True):
+        self.keys = list(keys)
+        self.values = list(values)
+        self.aggregations = list(aggregations)
+        self.sketch_quantiles = sketch_quantiles
+        needed = set()
+        for agg in self.aggregations:
+            needed.update({"mean": ("sum", "count")}.get(agg, (agg,) if agg in _MOMENT_MERGES else ()))
+        self.stats = [stat for stat in _MOMENT_MERGES if stat in needed]
+        self.moments = None
+        self.groups = None
+        self.distinct = {}
+        self.sketches = {}
+        self.rows = 0
+
+    def _numeric(self, chunk):
+        data = chunk[self.values].copy()
+        for col in self.values:
+            if not pd.api.types.is_numeric_dtype(data[col]) or pd.api.types.is_bool_dtype(data[col]):
+                data[col] = pd.to_numeric(data[col], errors="coerce")
+        return data
+
+    def update(self, chunk):
+        self.rows += len(chunk)
+        keys = _categorical_keys(chunk, self.keys)
+        # Every observed group, including those whose values are all missing
+        # (nunique and the sketches skip missing values, so they'd lose them).
+        groups = chunk.groupby(keys, observed=True, sort=False).size().index
+        self.groups = groups if self.groups is None else self.groups.append(groups).unique()
+        numeric = self._numeric(chunk) if self.stats or self.sketch_quantiles else None
+        if self.stats:
+            # count is of non-missing values as loaded; the rest need numbers.
+            frames = []
+            if "count" in self.stats:
+                counts = chunk[self.values].groupby(keys, observed=True, sort=False).count()
+                counts.columns = pd.MultiIndex.from_product([self.values, ["count"]])
+                frames.append(counts)
+            others = [stat for stat in self.stats if stat != "count"]
+            if others:
+                frames.append(numeric.groupby(keys, observed=True, sort=False).agg(others))
+            moments = pd.concat(frames, axis=1) if len(frames) > 1 else frames[0]
+            self.moments = moments if self.moments is None else self._combine([self.moments, moments])
+        if "nunique" in self.aggregations:
+            for col in self.values:
+                pairs = chunk.groupby(keys + [chunk[col]], observed=True, sort=False).size().index
+                self.distinct[col] = pairs if col not in self.distinct else self.distinct[col].append(pairs).unique()
+        if self.sketch_quantiles and any(agg in QUANTILE_AGGREGATIONS for agg in self.aggregations):
+            for col in self.values:
+                for key, series in numeric[col].groupby(keys, observed=True, sort=False):
+                    values = series.dropna().to_numpy(dtype=np.float64)
+                    if len(values):
+                        self.sketches.setdefault((col, key), QuantileSketch()).update(values)
+        return self
+
+    def _combine(self, frames):
+        levels = list(range(len(self.keys)))
+        return pd.concat(frames).groupby(level=levels, sort=False).agg(
+            {column: _MOMENT_MERGES[column[1]] for column in frames[0].columns})
+
+    def merge(self, other):
+        self.rows += other.rows
+        if other.groups is not None:
+            self.groups = other.groups if self.groups is None else self.groups.append(other.groups).unique()
+        if other.moments is not None:
+            self.moments = other.moments if self.moments is None else self._combine([self.moments, other.moments])
+        for col, pairs in other.distinct.items():
+            self.distinct[col] = pairs if col not in self.distinct else self.distinct[col].append(pairs).unique()
+        for key, sketch in other.sketches.items():
+            if key in self.sketches:
+                self.sketches[key].merge(sketch)
+            else:
+                self.sketches[key] = sketch
+        return self
+
+    def result(self, quantiles=None):
+        """A DataFrame indexed by the keys with one "<value> <aggregation>"
+        column per pair; `quantiles` maps (value, aggregation) to exact
+        per-group quantiles when the sketches were skipped."""
+        columns = {}
+        for col in self.values:
+            for agg in self.aggregations:
+                name = f"{col} {agg}"
+                if agg == "mean":
+                    columns[name] = self.moments[(col, "sum")] / self.moments[(col, "count")].replace(0, np.nan)
+                elif agg in _MOMENT_MERGES:
+                    columns[name] = self.moments[(col, agg)]
+                elif agg == "nunique":
+                    pairs = self.distinct.get(col)
+                    columns[name] = pd.Series(1, index=pairs).groupby(level=list(range(len(self.keys)))).size() \
+                        if pairs is not None and len(pairs) else pd.Series(dtype=np.int64)
+                elif quantiles is not None:
+                    columns[name] = quantiles[(col, agg)]
+                else:
+                    q = QUANTILE_AGGREGATIONS[agg]
+                    sketches = {key if isinstance(key, tuple) else (key,): sketch
+                                for (value, key), sketch in self.sketches.items() if value == col}
+                    index = pd.MultiIndex.from_tuples(list(sketches)) if sketches else pd.Index([])
+                    if sketches and len(self.keys) == 1:
+                        index = index.get_level_values(0)
+                    columns[name] = pd.Series([sketch.quantiles([q])[0] for sketch in sketches.values()],
+                                              index=index, dtype=np.float64)
+        for name, series in columns.items():
+            series.index = series.index.astype(object) if series.index.nlevels == 1 else series.index
+        result = pd.concat(columns, axis=1)
+        if self.groups is not None:
+            groups = self.groups.astype(object) if self.groups.nlevels == 1 else self.groups
+            result = result.reindex(groups)
+            nunique = [f"{col} nunique" for col in self.values] if "nunique" in self.aggregations else []
+            result[nunique] = result[nunique].fillna(0).astype(np.int64)
+        result.index.names = self.keys
+        try:
+            return result.sort_index()
+        except TypeError:
+            return result
+
+
+def peak_memory_bytes():
+    """Peak resident memory of this process so far, or None if unknown."""
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class ChunkedCSV:
+    """Lazy handle on a CSV that is too big to hold in memory.
+
+    `build_index` scans the file once to count rows and record the byte offset
+    of every `index_stride`-th row, so a window of rows can be read by seeking
+    rather than parsing from the top. Everything else streams over the file in
+    chunks of `chunk_rows`. Blank lines are skipped, as read_csv skips them,
+    and a newline inside a double-quoted field doesn't end a row: the scan
+    counts quote characters, so a newline is a row break only when an even
+    number of quotes precede it (an escaped "" counts twice).
+    """
+    def __init__(self, file_path, chunk_rows=100_000, index_stride=10_000):
+        self.file_path = file_path
+        self.chunk_rows = chunk_rows
+        self.index_stride = index_stride
+        self.columns = pd.read_csv(file_path, nrows=0).columns
+        self.total_bytes = os.path.getsize(file_path)
+        self.row_offsets = np.zeros(0, dtype=np.int64)
+        self.n_rows = 0
+
+    def __len__(self):
+        return self.n_rows
+
+    def build_index(self, progress=None, cancelled=None, block_bytes=8 * 1024 ** 2):
+        """Returns False if `cancelled()` turned true before the scan finished."""
+        offsets = []
+        rows = 0
+        previous_byte = 10
+        in_quotes = False
+        header = True
+        with open(self.file_path, "rb") as fh:
+            position = line_start = 0
+            while True:
+                block = fh.read(block_bytes)
+                if not block:
+                    break
+                data = np.frombuffer(block, dtype=np.uint8)
+                newlines = np.flatnonzero(data == 10)
+                quotes = np.flatnonzero(data == 34)
+                if len(quotes) or in_quotes:
+                    newlines = newlines[(np.searchsorted(quotes, newlines) + in_quotes) % 2 == 0]
+                    in_quotes = (len(quotes) + in_quotes) % 2 == 1
+                ends = position + newlines
+                starts = np.concatenate([[line_start], ends[:-1] + 1])
+                lengths = ends - starts
+                # A line of length 0 or 1 starts at most one byte before the block.
+                first_bytes = np.where(starts >= position, data[np.clip(starts - position, 0, len(data) - 1)],
+                                       previous_byte)
+                row_starts = starts[~((lengths == 0) | ((lengths == 1) & (first_bytes == 13)))]
+                if header and len(row_starts):
+                    row_starts, header = row_starts[1:], False
+                offsets.extend(row_starts[(-rows) % self.index_stride::self.index_stride].tolist())
+                rows += len(row_starts)
+                if len(ends):
+                    line_start = int(ends[-1]) + 1
+                previous_byte = int(data[-1])
+                position += len(block)
+                if progress is not None:
+                    progress(rows, position)
+                if cancelled is not None and cancelled():
+                    return False
+            fh.seek(line_start)
+            if fh.read(1024).strip() and not header:
+                if rows % self.index_stride == 0:
+                    offsets.append(line_start)
+                rows += 1
+        if not offsets:
+            offsets.append(line_start)
+        self.n_rows = rows
+        n_blocks = max(-(-rows // self.index_stride), 1)
+        self.row_offsets = np.array(offsets[:n_blocks], dtype=np.int64)
+        return True
+
+    def take_rows(self, start, stop, column_positions):
+        """Rows [start, stop) of the given columns, indexed by row number."""
+        stop = min(stop, self.n_rows)
+        if start >= stop:
+            return pd.DataFrame(columns=self.columns[column_positions])
+        block = start // self.index_stride
+        skip = start - block * self.index_stride
+        with open(self.file_path, "rb") as fh:
+            fh.seek(int(self.row_offsets[block]))
+            # nrows counts parsed rows, skiprows raw lines: read from the block
+            # start so blank lines can't shift the window.
+            window = pd.read_csv(fh, header=None, usecols=column_positions, nrows=stop - start + skip).iloc[skip:]
+        window.columns = self.columns[column_positions]
+        window.index = pd.RangeIndex(start, start + len(window))
+        return window
+
+    def iter_chunks(self, usecols=None):
+        with pd.read_csv(self.file_path, chunksize=self.chunk_rows, usecols=usecols) as reader:
+            yield from reader
+
+    def value_counts(self, col):
+        counts = pd.Series(dtype=np.int64)
+        for chunk in self.iter_chunks(usecols=[col]):
+            counts = counts.add(chunk[col].value_counts(), fill_value=0)
+        return counts.astype(np.int64).sort_values(ascending=False, kind="stable")
+
+
+class StatsCache:
+    """LRU cache of per-column aggregates, bounded by an approximate memory budget.
+
+    Entries are keyed by (kind, column) and remember the data version they were
+    computed at; `column` is None for aggregates that span every column.
+    """
+    def __init__(self, max_bytes=64 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.version = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def get(self, kind, column):
+        """The cached value, or None if missing or computed at an older version."""
+        key = (kind, column)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != self.version:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, kind, column, value, version=None):
+        """Stores `value` unless it was computed at a `version` since invalidated."""
+        if version is None or version == self.version:
+            self._store((kind, column), value)
+
+    def get_or_compute(self, kind, column, compute):
+        value = self.get(kind, column)
+        if value is None:
+            value = compute()
+            self._store((kind, column), value)
+        return value
+
+    def invalidate(self, columns=None):
+        """Drops entries for `columns` plus any all-column aggregates, or
+        everything (bumping the version) when `columns` is None."""
+        if columns is None:
+            self.version += 1
+            self._entries.clear()
+            self._bytes = 0
+            return
+        columns = set(columns)
+        for key in [k for k in self._entries if k[1] is None or k[1] in columns]:
+            self._bytes -= self._entries.pop(key)[2]
+
+    @classmethod
+    def _sizeof(cls, value):
+        if isinstance(value, (pd.Series, pd.DataFrame)):
+            return int(np.sum(value.memory_usage(deep=True)))
+        if isinstance(value, (np.ndarray, ColumnIndex)):
+            return value.nbytes
+        if isinstance(value, dict):
+            return sys.getsizeof(value) + sum(cls._sizeof(v) for v in value.values())
+        return sys.getsizeof(value)
+
+    def _store(self, key, value):
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[2]
+        nbytes = self._sizeof(value)
+        if nbytes > self.max_bytes:
+            return
+        self._entries[key] = (self.version, value, nbytes)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes:
+            self._bytes -= self._entries.popitem(last=False)[1][2]
+
+
+class ColumnIndex:
+    """Row positions of one column grouped by value, so equality filters
+    don't scan the column.
+
+    Numeric, boolean and datetime columns keep their positions sorted by
+    value, which answers equality and range lookups with two binary searches
+    (booleans are searched as 0/1, as pandas compares them). Other columns
+    are factorized (categoricals reuse their codes) and keep positions grouped
+    by code with per-code offsets, so equality is a lookup of the code.
+    """
+    def __init__(self, series):
+        position_dtype = np.int32 if len(series) < 2 ** 31 else np.int64
+        self.n_rows = len(series)
+        dtype = series.dtype
+        self.sorted = pd.api.types.is_numeric_dtype(dtype) or (isinstance(dtype, np.dtype) and dtype.kind == "M")
+        if self.sorted:
+            if isinstance(dtype, np.dtype):
+                values = series.to_numpy()
+                if dtype.kind == "b":
+                    values = values.view(np.int8)
+            else:
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            self.order = np.argsort(values, kind="stable").astype(position_dtype)
+            self.values = values[self.order]
+            self.n_valid = len(values) - int(series.isna().sum())
+            return
+        if isinstance(dtype, pd.CategoricalDtype):
+            codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+        else:
+            codes, uniques = pd.factorize(series)
+        self.uniques = pd.Index(uniques)
+        self.order = np.argsort(codes, kind="stable").astype(position_dtype)
+        # Offsets are indexed by code + 1 so missing values (code -1) come first.
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(codes + 1, minlength=len(uniques) + 1))])
+
+    @staticmethod
+    def estimated_nbytes(series):
+        """About how large ColumnIndex(series) will be, without building it."""
+        position_bytes = 4 if len(series) < 2 ** 31 else 8
+        return len(series) * (position_bytes + 8)
+
+    @property
+    def nbytes(self):
+        arrays = (self.order, self.values) if self.sorted else (self.order, self.offsets)
+        return sum(array.nbytes for array in arrays) + (0 if self.sorted else self.uniques.memory_usage(deep=True))
+
+    def _equal(self, value):
+        if self.sorted:
+            valid = self.values[:self.n_valid]
+            return self.order[np.searchsorted(valid, value, side="left"):np.searchsorted(valid, value, side="right")]
+        code = self.uniques.get_indexer([value])[0]
+        return self.order[self.offsets[code + 1]:self.offsets[code + 2]] if code >= 0 else self.order[:0]
+
+    def lookup(self, op, value):
+        """Sorted row positions where `column op value` holds, or None if this
+        index can't answer it (range ops on a factorized column, a value of
+        the wrong type)."""
+        try:
+            literals = list(dict.fromkeys(value)) if op in ("in", "not in") else [value]
+            if self.sorted and self.values.dtype.kind == "M":
+                literals = list(dict.fromkeys(pd.Timestamp(v).to_datetime64() for v in literals))
+            elif self.sorted and not all(isinstance(v, (int, float, np.number)) for v in literals):
+                return None
+            if op in ("==", "!=", "in", "not in"):
+                parts = [self._equal(v) for v in literals]
+                positions = parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts)) if parts else self.order[:0]
+                if op in ("==", "in"):
+                    return positions
+                mask = np.ones(self.n_rows, dtype=bool)
+                mask[positions] = False
+                return np.flatnonzero(mask).astype(self.order.dtype)
+            if not self.sorted:
+                return None
+            value, valid = literals[0], self.values[:self.n_valid]
+            if op == "<":
+                selected = self.order[:np.searchsorted(valid, value, side="left")]
+            elif op == "<=":
+                selected = self.order[:np.searchsorted(valid, value, side="right")]
+            elif op == ">":
+                selected = self.order[np.searchsorted(valid, value, side="right"):self.n_valid]
+            else:
+                selected = self.order[np.searchsorted(valid, value, side="left"):self.n_valid]
+            return np.sort(selected)
+        except (TypeError, ValueError):
+            return None
+
+
+_QUERY_OPS = {ast.Eq: "==", ast.NotEq: "!=", ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">=",
+              ast.In: "in", ast.NotIn: "not in"}
+FILTER_OPS = tuple(_QUERY_OPS.values())
+
+
+def parse_simple_query(expr, columns):
+    """Splits a pandas query made only of `column op literal` clauses joined
+    by "and" into (column, op, value) tuples; None for anything else."""
+    names = {}
+
+    def placeholder(match):
+        names[f"__column_{len(names)}"] = match.group(1)
+        return f"__column_{len(names) - 1}"
+
+    try:
+        tree = ast.parse(re.sub(r"`([^`]*)`", placeholder, expr).strip(), mode="eval").body
+    except SyntaxError:
+        return None
+    clauses = tree.values if isinstance(tree, ast.BoolOp) and isinstance(tree.op, ast.And) else [tree]
+    conditions = []
+    for clause in clauses:
+        if not (isinstance(clause, ast.Compare) and len(clause.ops) == 1 and isinstance(clause.left, ast.Name)
+                and type(clause.ops[0]) in _QUERY_OPS):
+            return None
+        col = names.get(clause.left.id, clause.left.id)
+        try:
+            value = ast.literal_eval(clause.comparators[0])
+        except ValueError:
+            return None
+        op = _QUERY_OPS[type(clause.ops[0])]
+        if col not in columns or isinstance(value, dict) or \
+                (op in ("in", "not in")) != isinstance(value, (list, tuple, set)):
+            return None
+        conditions.append((col, op, list(value) if op in ("in", "not in") else value))
+    return conditions
+
+
+def filter_positions(df, expr, index_for):
+    """Sorted positions of the rows of `df` matching the pandas query `expr`.
+
+    Queries parse_simple_query understands are answered from `index_for(col)`
+    (a ColumnIndex) by intersecting each clause's positions; anything else,
+    or a clause whose column has no index (`index_for` returned None), is
+    evaluated with DataFrame.eval.
+    """
+    conditions = parse_simple_query(expr, df.columns)
+    if conditions:
+        indexes = [index_for(col) for col, _, _ in conditions]
+        parts = [index.lookup(op, value) if index is not None else None
+                 for index, (_, op, value) in zip(indexes, conditions)]
+        if all(part is not None for part in parts):
+            parts.sort(key=len)
+            positions = parts[0]
+            for part in parts[1:]:
+                positions = np.intersect1d(positions, part, assume_unique=True)
+            return positions
+    mask = df.eval(expr)
+    if not isinstance(mask, pd.Series) or not pd.api.types.is_bool_dtype(mask):
+        raise ValueError("The filter must be a condition, e.g. city == 'Paris' and price > 10.")
+    return np.flatnonzero(mask.to_numpy(dtype=bool, na_value=False))
+
+
+def filter_condition(series, op, text):
+    """Query text for `series op text` as typed in a condition builder: numbers
+    stay numbers for numeric columns, true/false become booleans for boolean
+    columns, everything else is quoted; for "in" and "not in" `text` is a
+    comma-separated list."""
+    boolean = pd.api.types.is_bool_dtype(series.dtype)
+    numeric = pd.api.types.is_numeric_dtype(series.dtype) and not boolean
+
+    def literal(item):
+        item = item.strip()
+        if boolean and item.lower() in _BOOL_TEXT:
+            return repr(_BOOL_TEXT[item.lower()])
+        if numeric:
+            try:
+                number = ast.literal_eval(item)
+            except (ValueError, SyntaxError):
+                number = None
+            if isinstance(number, (int, float)) and not isinstance(number, bool):
+                return item
+        return repr(item)
+
+    value = "[" + ", ".join(literal(item) for item in text.split(",")) + "]" if op in ("in", "not in") \
+        else literal(text)
+    return f"`{series.name}` {op} {value}"
+
+
+class ParsedCSVCache:
+    """On-disk cache of parsed CSVs, stored as uncompressed Arrow IPC files.
+
+    Entries are keyed by the CSV's absolute path, size, mtime and a hash of
+    sampled blocks of its content, plus the load variant (default or compact).
+    Hits are memory-mapped rather than re-parsed. Once the directory grows past
+    `max_bytes` the least recently used entries are deleted.
+
+    The directory and budget default to $CSV_ANALYZER_CACHE_DIR (or
+    ~/.cache/csv_analyzer) and $CSV_ANALYZER_CACHE_MB (2048). Without pyarrow
+    the cache is disabled.
+    """
+    hash_block_bytes = 1024 ** 2
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = (cache_dir or os.environ.get("CSV_ANALYZER_CACHE_DIR")
+                          or os.path.join(os.path.expanduser("~"), ".cache", "csv_analyzer"))
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("CSV_ANALYZER_CACHE_MB", 2048)) * 1024 ** 2
+        self.max_bytes = max_bytes
+        self.enabled = HAS_PYARROW and self.max_bytes > 0
+
+    def key(self, file_path, variant=""):
+        stat = os.stat(file_path)
+        digest = hashlib.sha256(
+            f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{variant}".encode())
+        block = self.hash_block_bytes
+        with open(file_path, "rb") as fh:
+            for offset in sorted({0, max(stat.st_size // 2 - block // 2, 0), max(stat.st_size - block, 0)}):
+                fh.seek(offset)
+                digest.update(fh.read(block))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ".arrow")
+
+    def load(self, key):
+        """Returns (df, metadata) for a cached entry, or None on a miss."""
+        path = self._entry_path(key)
+        if not self.enabled or not os.path.exists(path):
+            return None
+        import pyarrow as pa
+
+        try:
+            with pa.memory_map(path) as source:
+                table = pa.ipc.open_file(source).read_all()
+                metadata = json.loads((table.schema.metadata or {}).get(b"csv_analyzer", b"{}"))
+                df = table.to_pandas()
+        except (OSError, ValueError, pa.ArrowException):
+            return None
+        os.utime(path)
+        return df, metadata
+
+    def store(self, key, df, metadata=None):
+        """Writes `df` under `key`; returns False if it can't be cached."""
+        if not self.enabled:
+            return False
+        import pyarrow as pa
+
+        tmp_path = None
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if table.nbytes > self.max_bytes:
+                return False
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                                   b"csv_analyzer": json.dumps(metadata or {}).encode()})
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+            os.close(fd)
+            with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp_path, self._entry_path(key))
+            tmp_path = None
+        except (OSError, pa.ArrowException):
+            return False
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._evict()
+        return True
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".arrow"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+
+class BackgroundJob(threading.Thread):
+    """Base class for work done on a daemon thread.
+
+    Progress is reported as (kind, payload) tuples on `messages` so the Tk
+    thread can pick them up from the event loop; widgets are never touched
+    here. run() posts ("progress", ...) updates and ends with ("done", result),
+    ("cancelled", None) or ("error", exception); cancel() sets `_cancel_event`,
+    which run() checks between chunks.
+    """
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.messages = queue.Queue()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+
+class CSVLoader(BackgroundJob):
+    """Parses a CSV in chunks on a worker thread."""
+    def __init__(self, file_path, chunk_rows=100_000, read_kwargs=None, compact=False, sample_rows=100_000,
+                 cache=None, out_of_core=False):
+        super().__init__()
+        self.out_of_core = out_of_core
+        self.file_path = file_path
+        self.chunk_rows = chunk_rows
+        self.read_kwargs = read_kwargs or {}
+        self.compact = compact
+        self.sample_rows = sample_rows
+        self.cache = cache
+        self.from_cache = False
+        self.total_bytes = os.path.getsize(file_path)
+        self.memory_before = None
+
+    def _plan_compact_read(self):
+        sample = pd.read_csv(self.file_path, nrows=self.sample_rows, **self.read_kwargs)
+        dtype, parse_dates = infer_compact_dtypes(sample)
+        self.read_kwargs = {**self.read_kwargs, "dtype": dtype, "parse_dates": parse_dates}
+        return sample.memory_usage(deep=True, index=False) / max(len(sample), 1)
+
+    def _load_cached(self, cache_key):
+        cached = self.cache.load(cache_key)
+        if cached is None:
+            return None
+        df, metadata = cached
+        if metadata.get("memory_before") is not None:
+            self.memory_before = pd.Series(metadata["memory_before"], dtype=np.int64)
+        self.from_cache = True
+        self.messages.put(("schema", list(df.columns)))
+        self.messages.put(("progress", (len(df), self.total_bytes)))
+        return df
+
+    def _open_out_of_core(self):
+        handle = ChunkedCSV(self.file_path, chunk_rows=self.chunk_rows)
+        self.messages.put(("schema", list(handle.columns)))
+        finished = handle.build_index(
+            progress=lambda rows, position: self.messages.put(("progress", (rows, position))),
+            cancelled=self._cancel_event.is_set)
+        self.messages.put(("done", handle) if finished else ("cancelled", None))
+
+    def run(self):
+        try:
+            if self.out_of_core:
+                self._open_out_of_core()
+                return
+            cache_key = None
+            if self.cache is not None and self.cache.enabled:
+                variant = json.dumps({"compact": self.compact, "read_kwargs": self.read_kwargs},
+                                     sort_keys=True, default=str)
+                cache_key = self.cache.key(self.file_path, variant)
+                df = self._load_cached(cache_key)
+                if df is not None:
+                    self.messages.put(("done", df))
+                    return
+
+            bytes_per_row = self._plan_compact_read() if self.compact else None
+            chunks = []
+            rows = 0
+            with open(self.file_path, "rb") as fh:
+                with pd.read_csv(fh, chunksize=self.chunk_rows, **self.read_kwargs) as reader:
+                    for chunk in reader:
+                        if self._cancel_event.is_set():
+                            self.messages.put(("cancelled", None))
+                            return
+                        if not chunks:
+                            self.messages.put(("schema", list(chunk.columns)))
+                        chunks.append(chunk)
+                        rows += len(chunk)
+                        self.messages.put(("progress", (rows, fh.tell())))
+            if self._cancel_event.is_set():
+                self.messages.put(("cancelled", None))
+                return
+            df = concat_frames(chunks)
+            if self.compact:
+                downcast_numeric(df)
+                self.memory_before = (bytes_per_row * len(df)).round().astype(np.int64)
+            if cache_key is not None:
+                self.messages.put(("status", "Writing cache..."))
+                memory_before = self.memory_before.to_dict() if self.memory_before is not None else None
+                self.cache.store(cache_key, df, {"memory_before": memory_before})
+            self.messages.put(("done", df))
+        except Exception as e:
+            self.messages.put(("error", e))
+
+
+def _load_shard(file_path, compact, cache):
+    loader = CSVLoader(file_path, compact=compact, cache=cache)
+    return run_sync(loader), loader.memory_before, loader.from_cache
+
+
+class MultiCSVLoader(BackgroundJob):
+    """Loads several CSV shards in parallel and concatenates them once.
+
+    Each shard is parsed by a CSVLoader in a worker process (so compact mode
+    and the parsed CSV cache still apply), then concat_frames reconciles the
+    columns and dtypes. Cancel drops shards that haven't started yet.
+    """
+    def __init__(self, file_paths, compact=False, cache=None, source_column=None, jobs=None):
+        super().__init__()
+        self.file_paths = list(file_paths)
+        self.compact = compact
+        self.cache = cache
+        self.source_column = source_column
+        self.jobs = jobs
+        self.total_bytes = sum(os.path.getsize(path) for path in self.file_paths)
+        self.memory_before = None
+        self.from_cache = False
+
+    def run(self):
+        try:
+            frames = [None] * len(self.file_paths)
+            befores = []
+            columns = {}
+            rows = bytes_done = 0
+            cached = 0
+            # This runs on a worker thread beside Tk and other jobs, where
+            # forking could copy a held lock into the children.
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            pool = ProcessPoolExecutor(max_workers=self.jobs, mp_context=multiprocessing.get_context(method))
+            try:
+                futures = {pool.submit(_load_shard, path, self.compact, self.cache): i
+                           for i, path in enumerate(self.file_paths)}
+                for future in as_completed(futures):
+                    if self._cancel_event.is_set():
+                        self.messages.put(("cancelled", None))
+                        return
+                    i = futures[future]
+                    frames[i], before, from_cache = future.result()
+                    befores.append(before)
+                    cached += from_cache
+                    columns.update(dict.fromkeys(frames[i].columns))
+                    rows += len(frames[i])
+                    bytes_done += os.path.getsize(self.file_paths[i])
+                    self.messages.put(("schema", list(columns)))
+                    self.messages.put(("progress", (rows, bytes_done)))
+            finally:
+                pool.shutdown(wait=not self._cancel_event.is_set(), cancel_futures=True)
+
+            self.messages.put(("status", f"Combining {len(frames)} files..."))
+            names = [os.path.basename(path) for path in self.file_paths]
+            if len(set(names)) < len(names):
+                names = self.file_paths
+            df = concat_frames(frames, names if self.source_column else None, self.source_column or "source_file")
+            if self.compact and all(before is not None for before in befores):
+                self.memory_before = pd.concat(befores).groupby(level=0, sort=False).sum()
+            self.from_cache = cached == len(frames)
+            self.messages.put(("done", df))
+        except Exception as e:
+            self.messages.put(("error", e))
+
+
+COMPRESSED_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+
+def export_format(file_path):
+    """Returns "parquet", "feather" or "csv" from the file extension."""
+    lower = file_path.lower()
+    for fmt in ("parquet", "feather"):
+        if lower.endswith("." + fmt):
+            return fmt
+    return "csv"
+
+
+def new_file_mode(file_path):
+    """Permission bits a file written to `file_path` should get: the existing
+    file's when it is being replaced, otherwise what open() would give under
+    the current umask."""
+    try:
+        return stat.S_IMODE(os.stat(file_path).st_mode)
+    except FileNotFoundError:
+        pass
+    umask = None
+    try:
+        with open("/proc/self/status") as fh:
+            umask = next((int(line.split()[1], 8) for line in fh if line.startswith("Umask:")), None)
+    except OSError:
+        pass
+    if umask is None:
+        umask = os.umask(0)
+        os.umask(umask)
+    return 0o666 & ~umask
+
+
+class DataFrameExporter(BackgroundJob):
+    """Writes a DataFrame in row chunks on a worker thread.
+
+    `source` is a DataFrame or a ChunkedCSV. Output goes to a temporary file
+    beside the target that replaces it only once every chunk is written, so a
+    cancelled or failed export never leaves a truncated file.
+    """
+    def __init__(self, source, file_path, chunk_rows=100_000):
+        super().__init__()
+        self.source = source
+        self.file_path = file_path
+        self.chunk_rows = chunk_rows
+        self.total_rows = len(source)
+
+    def run(self):
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".export-", suffix=".tmp", dir=directory)
+            os.close(fd)
+            fmt = export_format(self.file_path)
+            if fmt == "csv":
+                self._write_csv(tmp_path)
+            else:
+                self._write_arrow(tmp_path, fmt)
+            if self._cancel_event.is_set():
+                self.messages.put(("cancelled", None))
+                return
+            # mkstemp creates the file 0600; give it the mode a plain write would have.
+            os.chmod(tmp_path, new_file_mode(self.file_path))
+            os.replace(tmp_path, self.file_path)
+            tmp_path = None
+            self.messages.put(("done", self.file_path))
+        except Exception as e:
+            self.messages.put(("error", e))
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _chunks(self):
+        if isinstance(self.source, ChunkedCSV):
+            chunks = self.source.iter_chunks()
+        else:
+            chunks = (self.source.iloc[start:start + self.chunk_rows]
+                      for start in range(0, max(self.total_rows, 1), self.chunk_rows))
+        start = 0
+        for chunk in chunks:
+            if self._cancel_event.is_set():
+                return
+            yield start, chunk
+            start += len(chunk)
+            self.messages.put(("progress", start))
+
+    def _write_csv(self, tmp_path):
+        opener = COMPRESSED_OPENERS.get(os.path.splitext(self.file_path.lower())[1], open)
+        with opener(tmp_path, "wt", newline="", encoding="utf-8") as fh:
+            for start, chunk in self._chunks():
+                chunk.to_csv(fh, header=start == 0, index=False)
+
+    def _write_arrow(self, tmp_path, fmt):
+        if not HAS_PYARROW:
+            raise RuntimeError("Parquet and Feather export need the pyarrow package.")
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        schema = None
+        try:
+            for start, chunk in self._chunks():
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    schema = table.schema
+                    if fmt == "parquet":
+                        writer = pq.ParquetWriter(tmp_path, schema)
+                    else:
+                        writer = pa.ipc.new_file(tmp_path, schema,
+                                                 options=pa.ipc.IpcWriteOptions(compression="zstd"))
+                else:
+                    table = table.cast(schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+class ProfileJob(BackgroundJob):
+    """Profiles columns with ColumnProfiler on a worker thread.
+
+    In-memory frames are profiled one column at a time in row chunks, posting
+    ("column", (name, stats)) as each finishes. A ChunkedCSV is streamed once,
+    updating every column per chunk, and posts the columns at the end. The
+    result is a {name: stats} dict. `version` and `cache_key` say where the
+    caller should cache the results.
+    """
+    def __init__(self, source, columns=None, chunk_rows=1_000_000, version=None, cache_key=None):
+        super().__init__()
+        self.source = source
+        self.cache_key = cache_key
+        wanted = None if columns is None else set(columns)
+        self.positions = [i for i, col in enumerate(source.columns) if wanted is None or col in wanted]
+        self.chunk_rows = chunk_rows
+        self.version = version
+        self.total_rows = len(source)
+
+    def run(self):
+        try:
+            results = self._profile_stream() if isinstance(self.source, ChunkedCSV) else self._profile_frame()
+            if results is None:
+                self.messages.put(("cancelled", None))
+            else:
+                self.messages.put(("done", results))
+        except Exception as e:
+            self.messages.put(("error", e))
+
+    def _profile_frame(self):
+        df = self.source
+        results = {}
+        for i in self.positions:
+            series = df.iloc[:, i]
+            profiler = ColumnProfiler(series.dtype)
+            for start in range(0, max(len(series), 1), self.chunk_rows):
+                if self._cancel_event.is_set():
+                    return None
+                profiler.update(series.iloc[start:start + self.chunk_rows])
+            results[df.columns[i]] = profiler.result()
+            self.messages.put(("column", (df.columns[i], results[df.columns[i]])))
+        return results
+
+    def _profile_stream(self):
+        profilers = {}
+        rows = 0
+        for chunk in self.source.iter_chunks():
+            if self._cancel_event.is_set():
+                return None
+            for i in self.positions:
+                series = chunk.iloc[:, i]
+                profilers.setdefault(i, ColumnProfiler(series.dtype)).update(series)
+            rows += len(chunk)
+            self.messages.put(("progress", rows))
+        results = {}
+        for i, profiler in profilers.items():
+            results[self.source.columns[i]] = profiler.result()
+            self.messages.put(("column", (self.source.columns[i], results[self.source.columns[i]])))
+        return results
+
+
+CHART_KINDS = ("bar", "pie", "hist", "timeseries")
+
+
+class MinMaxDownsampler:
+    """Reduces a long numeric series, fed in order, to the min and max of each
+    of `buckets` equal row ranges. With one bucket per horizontal pixel the
+    line drawn through them covers the same pixels as every point would.
+    Series of at most 2 * `buckets` values are kept as they are.
+    """
+    def __init__(self, n_rows, buckets):
+        self.n_rows = n_rows
+        self.buckets = max(1, buckets)
+        self.raw = [] if n_rows <= 2 * self.buckets else None
+        self.mins = np.full(self.buckets, np.nan)
+        self.maxs = np.full(self.buckets, np.nan)
+        self.position = 0
+
+    def update(self, values):
+        if self.raw is not None:
+            self.raw.append(values)
+        elif len(values):
+            ids = np.minimum(np.arange(self.position, self.position + len(values)) * self.buckets // self.n_rows,
+                             self.buckets - 1)
+            starts = np.concatenate([[0], np.flatnonzero(np.diff(ids)) + 1])
+            ids = ids[starts]
+            self.mins[ids] = np.fmin(self.mins[ids], np.fmin.reduceat(values, starts))
+            self.maxs[ids] = np.fmax(self.maxs[ids], np.fmax.reduceat(values, starts))
+        self.position += len(values)
+
+    def result(self):
+        """(x, y) arrays: row positions and values, or bucket starts with each
+        bucket's min and max."""
+        if self.raw is not None:
+            y = np.concatenate(self.raw) if self.raw else np.empty(0)
+            return np.arange(len(y)), y
+        x = np.arange(self.buckets) * (self.n_rows / self.buckets)
+        return np.repeat(x, 2), np.column_stack([self.mins, self.maxs]).ravel()
+
+
+class TimeMinMaxDownsampler:
+    """MinMaxDownsampler against a time axis: the min and max of each of
+    `buckets` equal time ranges from `start` to `end` (int64 nanoseconds),
+    whatever order the rows arrive in. Up to 2 * `buckets` rows are kept as
+    they are and sorted by time.
+    """
+    def __init__(self, n_rows, start, end, buckets):
+        self.start = start
+        self.span = max(end - start, 1)
+        self.buckets = max(1, buckets)
+        self.raw = [] if n_rows <= 2 * self.buckets else None
+        self.mins = np.full(self.buckets, np.nan)
+        self.maxs = np.full(self.buckets, np.nan)
+        self.position = 0
+
+    def update(self, times, values):
+        if self.raw is not None:
+            self.raw.append((times, values))
+        elif len(values):
+            ids = np.minimum(((times - self.start) / self.span * self.buckets).astype(np.int64), self.buckets - 1)
+            np.fmin.at(self.mins, ids, values)
+            np.fmax.at(self.maxs, ids, values)
+        self.position += len(values)
+
+    def result(self):
+        """(x, y) arrays: datetime64 times and values, or bucket starts with
+        each bucket's min and max."""
+        if self.raw is not None:
+            times = np.concatenate([t for t, _ in self.raw]) if self.raw else np.empty(0, dtype=np.int64)
+            values = np.concatenate([v for _, v in self.raw]) if self.raw else np.empty(0)
+            order = np.argsort(times, kind="stable")
+            return times[order].view("datetime64[ns]"), values[order]
+        x = self.start + (np.arange(self.buckets) * (self.span / self.buckets)).astype(np.int64)
+        return np.repeat(x, 2).view("datetime64[ns]"), np.column_stack([self.mins, self.maxs]).ravel()
+
+
+def compute_top_values(source, col=None, n=10):
+    """Top-n value counts of `col` (or across all columns when None) in a
+    DataFrame, streamed from disk for a ChunkedCSV."""
+    if isinstance(source, ChunkedCSV):
+        if col is None:
+            return top_values_across_chunks(source.iter_chunks, n=n)
+        return source.value_counts(col).head(n)
+    if col is None:
+        return top_values_across_columns(source, n=n)
+    counts = source[col].value_counts()
+    return counts[counts > 0].head(n)
+
+
+def _numeric_chunks(source, col, chunk_rows=1_000_000):
+    """Yields `col` as float64 arrays (NaN for missing) in row order."""
+    if isinstance(source, ChunkedCSV):
+        for chunk in source.iter_chunks(usecols=[col]):
+            yield pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        return
+    series = source[col]
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        raise ValueError(f"Column '{col}' is not numeric.")
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    for start in range(0, len(values), chunk_rows):
+        yield values[start:start + chunk_rows]
+
+
+def _time_ns(series):
+    """`series` parsed as dates/times, as int64 nanoseconds (NaT as the int64 minimum)."""
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            series = pd.to_datetime(series, errors="coerce")
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        series = series.dt.tz_localize(None)
+    return series.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def _timed_chunks(source, time_col, col, chunk_rows=1_000_000):
+    """Yields (`time_col` as int64 nanoseconds, `col` as float64) array pairs
+    in row order, leaving out rows without a valid time."""
+    if time_col == col:
+        raise ValueError("Pick a time column other than the charted column.")
+    if isinstance(source, ChunkedCSV):
+        chunks = source.iter_chunks(usecols=[time_col, col])
+    else:
+        if not pd.api.types.is_numeric_dtype(source[col]) or pd.api.types.is_bool_dtype(source[col]):
+            raise ValueError(f"Column '{col}' is not numeric.")
+        chunks = (source.iloc[start:start + chunk_rows][[time_col, col]]
+                  for start in range(0, len(source), chunk_rows))
+    for chunk in chunks:
+        times = _time_ns(chunk[time_col])
+        values = pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = times != np.iinfo(np.int64).min
+        yield times[valid], values[valid]
+
+
+def compute_chart_data(source, kind, col=None, n=10, buckets=1000, bins=50, cancelled=lambda: False,
+                       time_col=None):
+    """The aggregate behind a chart, as a dict for draw_chart.
+
+    bar/pie hold the top-n `counts`; hist holds `counts` and bin `edges`; a
+    timeseries holds `x` and `y`, downsampled to `buckets` min/max pairs. Its
+    x axis is the row position, or the parsed dates of `time_col` when given
+    (rows without a date are left out). Returns None if `cancelled()` turns
+    true between chunks.
+    """
+    if kind not in CHART_KINDS:
+        raise ValueError(f"Unknown chart type '{kind}'.")
+    if col is None and kind != "bar":
+        raise ValueError(f"{CHART_NAMES[kind]} for all columns is not supported. Please select a specific column.")
+    data = {"kind": kind, "column": col}
+    if kind in ("bar", "pie"):
+        data["counts"] = compute_top_values(source, col, n)
+        data["approximate"] = bool(data["counts"].attrs.get("approximate"))
+        return data
+    if kind == "hist":
+        low, high = np.inf, -np.inf
+        for values in _numeric_chunks(source, col):
+            if cancelled():
+                return None
+            values = values[~np.isnan(values)]
+            if len(values):
+                low, high = min(low, values.min()), max(high, values.max())
+        if low > high:
+            raise ValueError(f"Column '{col}' has no numeric values.")
+        counts = np.zeros(bins, dtype=np.int64)
+        for values in _numeric_chunks(source, col):
+            if cancelled():
+                return None
+            counts += np.histogram(values[~np.isnan(values)], bins=bins, range=(low, high))[0]
+        data["counts"] = counts
+        data["edges"] = np.histogram_bin_edges([], bins=bins, range=(low, high))
+        return data
+    data["time_column"] = time_col
+    if time_col is None:
+        sampler = MinMaxDownsampler(len(source), buckets)
+        for values in _numeric_chunks(source, col):
+            if cancelled():
+                return None
+            sampler.update(values)
+    else:
+        # Two passes, as for the histogram: the time range, then the buckets.
+        # In-memory columns are parsed once and the arrays reused.
+        chunks = _timed_chunks(source, time_col, col)
+        if not isinstance(source, ChunkedCSV):
+            chunks = list(chunks)
+        low, high, rows = np.iinfo(np.int64).max, np.iinfo(np.int64).min, 0
+        for times, _ in chunks:
+            if cancelled():
+                return None
+            if len(times):
+                low, high, rows = min(low, int(times.min())), max(high, int(times.max())), rows + len(times)
+        if not rows:
+            raise ValueError(f"Column '{time_col}' has no dates or times.")
+        sampler = TimeMinMaxDownsampler(rows, low, high, buckets)
+        for times, values in chunks if isinstance(chunks, list) else _timed_chunks(source, time_col, col):
+            if cancelled():
+                return None
+            sampler.update(times, values)
+    data["x"], data["y"] = sampler.result()
+    if np.isnan(data["y"]).all():
+        raise ValueError(f"Column '{col}' has no numeric values.")
+    data["rows"] = sampler.position
+    data["downsampled"] = sampler.raw is None
+    return data
+
+
+class ChartJob(BackgroundJob):
+    """Computes compute_chart_data on a worker thread so the UI stays
+    responsive; `version` and `cache_key` say where to cache the result."""
+    def __init__(self, source, kind, col=None, n=10, buckets=1000, version=None, cache_key=None, time_col=None):
+        super().__init__()
+        self.source = source
+        self.cache_key = cache_key
+        self.kind = kind
+        self.column = col
+        self.n = n
+        self.buckets = buckets
+        self.time_col = time_col
+        self.version = version
+
+    def run(self):
+        try:
+            data = compute_chart_data(self.source, self.kind, self.column, self.n, self.buckets,
+                                      cancelled=self._cancel_event.is_set, time_col=self.time_col)
+            self.messages.put(("cancelled", None) if data is None else ("done", data))
+        except Exception as e:
+            self.messages.put(("error", e))
+
+
+class GroupByJob(BackgroundJob):
+    """Group-by / pivot aggregation on a worker thread.
+
+    In-memory frames are split into `chunk_rows` chunks aggregated in
+    parallel by a thread pool (pandas' groupby kernels release the GIL) and
+    merged; quantiles are then computed exactly in one vectorized groupby. A
+    ChunkedCSV is streamed through one GroupAggregator, with sketched
+    quantiles. `pivot` moves the last key into the columns. Posts
+    ("progress", rows) and finishes with ("done", DataFrame).
+    """
+    def __init__(self, source, keys, values, aggregations, pivot=False, chunk_rows=1_000_000, jobs=None,
+                 version=None, cache_key=None):
+        super().__init__()
+        self.source = source
+        self.keys = list(keys)
+        self.values = list(values)
+        self.aggregations = list(aggregations)
+        self.pivot = pivot
+        self.chunk_rows = chunk_rows
+        self.jobs = jobs or min(8, os.cpu_count() or 1)
+        self.version = version
+        self.cache_key = cache_key
+        self.total_rows = len(source)
+
+    def run(self):
+        try:
+            if isinstance(self.source, ChunkedCSV):
+                result = self._aggregate_stream()
+            else:
+                result = self._aggregate_frame()
+            if result is None:
+                self.messages.put(("cancelled", None))
+                return
+            if self.pivot and len(self.keys) > 1:
+                result = result.unstack(level=-1)
+                result.columns = [f"{name} | {key}" for name, key in result.columns]
+            self.messages.put(("done", result))
+        except Exception as e:
+            self.messages.put(("error", e))
+
+    def _aggregate_stream(self):
+        aggregator = GroupAggregator(self.keys, self.values, self.aggregations)
+        for chunk in self.source.iter_chunks(usecols=list(dict.fromkeys(self.keys + self.values))):
+            if self._cancel_event.is_set():
+                return None
+            aggregator.update(chunk)
+            self.messages.put(("progress", aggregator.rows))
+        return aggregator.result()
+
+    def _aggregate_frame(self):
+        df = self.source[list(dict.fromkeys(self.keys + self.values))]
+        chunks = [df.iloc[start:start + self.chunk_rows] for start in range(0, max(len(df), 1), self.chunk_rows)]
+        aggregator = GroupAggregator(self.keys, self.values, self.aggregations, sketch_quantiles=False)
+
+        def aggregate(chunk):
+            if self._cancel_event.is_set():
+                return None
+            return GroupAggregator(self.keys, self.values, self.aggregations, sketch_quantiles=False).update(chunk)
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            for partial in pool.map(aggregate, chunks):
+                if partial is None or self._cancel_event.is_set():
+                    return None
+                aggregator.merge(partial)
+                self.messages.put(("progress", aggregator.rows))
+
+        quantiles = {}
+        wanted = [agg for agg in self.aggregations if agg in QUANTILE_AGGREGATIONS]
+        if wanted:
+            numeric = aggregator._numeric(df)
+            grouped = numeric.groupby(_categorical_keys(df, self.keys), observed=True, sort=False)
+            for col in self.values:
+                for agg in wanted:
+                    quantiles[(col, agg)] = grouped[col].quantile(QUANTILE_AGGREGATIONS[agg])
+        return aggregator.result(quantiles)
+
+
+def run_sync(job, on_progress=None):
+    """Runs a CSVLoader, DataFrameExporter, ProfileJob, ChartJob or GroupByJob in the calling thread and returns
+    its result, raising the job's exception if it failed."""
+    job.run()
+    result = None
+    while not job.messages.empty():
+        kind, payload = job.messages.get_nowait()
+        if kind == "progress" and on_progress is not None:
+            on_progress(payload)
+        elif kind == "error":
+            raise payload
+        elif kind == "done":
+            result = payload
+    return result
+
+
+CHART_NAMES = {"bar": "Bar chart", "pie": "Pie chart", "hist": "Histogram", "timeseries": "Time series"}
+
+
+def grouped_chart_data(result, limit=30):
+    """Chart data (for draw_chart) of the first column of a group-by result,
+    limited to the first `limit` groups."""
+    series = result.iloc[:limit, 0]
+    labels = [" / ".join(map(str, key)) if isinstance(key, tuple) else str(key) for key in series.index]
+    return {"kind": "grouped", "column": result.columns[0], "counts": pd.Series(series.to_numpy(), index=labels),
+            "keys": list(result.index.names), "groups": len(result)}
+
+
+def chart_title(data):
+    col = data["column"]
+    if data["kind"] == "grouped":
+        shown = f" (first {len(data['counts'])} of {data['groups']:,} groups)" if data["groups"] > len(data["counts"]) else ""
+        return f"{col} by {', '.join(map(str, data['keys']))}{shown}"
+    if data["kind"] == "bar":
+        approximate = " (\u2248 approximate)" if data.get("approximate") else ""
+        return f"Top 10 Values Across All Columns{approximate}" if col is None else f"Top 10 Values in '{col}'"
+    if data["kind"] == "pie":
+        return f"Distribution of '{col}'"
+    if data["kind"] == "hist":
+        return f"Histogram of '{col}'"
+    suffix = ", min/max per pixel" if data["downsampled"] else ""
+    if data.get("time_column") is not None:
+        return f"'{col}' over '{data['time_column']}' ({data['rows']:,} rows{suffix})"
+    return f"'{col}' by Row ({data['rows']:,} rows{suffix})"
+
+
+def draw_chart(fig, data):
+    """Clears `fig` and draws the chart for compute_chart_data's `data`;
+    returns the artists holding the data (bars, wedges or the line)."""
+    fig.clear()
+    ax = fig.add_subplot()
+    kind, col = data["kind"], data["column"]
+    if kind in ("bar", "grouped"):
+        counts = data["counts"]
+        artists = list(ax.bar(np.arange(len(counts)), counts.to_numpy()))
+        ax.set_xticks(np.arange(len(counts)), [str(value) for value in counts.index], rotation=90)
+        if kind == "bar":
+            ax.set_ylabel("Count")
+            ax.set_xlabel("Value" if col is None else col)
+        else:
+            ax.set_ylabel(col)
+            ax.set_xlabel(" / ".join(map(str, data["keys"])))
+    elif kind == "pie":
+        counts = data["counts"]
+        artists = ax.pie(counts.to_numpy(), labels=[str(value) for value in counts.index],
+                         autopct='%1.1f%%', startangle=140)[0]
+    elif kind == "hist":
+        edges = data["edges"]
+        artists = list(ax.bar(edges[:-1], data["counts"], width=np.diff(edges), align="edge"))
+        ax.set_ylabel("Count")
+        ax.set_xlabel(col)
+    else:
+        artists = ax.plot(data["x"], data["y"], linewidth=0.8)
+        ax.set_xlabel("Row" if data.get("time_column") is None else data["time_column"])
+        ax.set_ylabel(col)
+        if data.get("time_column") is not None:
+            fig.autofmt_xdate()
+    ax.set_title(chart_title(data))
+    fig.tight_layout()
+    return artists
+
+
+def build_chart_figure(data):
+    """A chart for compute_chart_data's `data` on a bare Figure, so callers
+    pick the canvas (Figure.savefig with Agg/SVG on the command line)."""
+    fig = Figure(figsize=(8, 5))
+    draw_chart(fig, data)
+    return fig
+
+
+class AnalysisEngine:
+    """The loaded data and every operation on it, independent of any UI.
+
+    Holds either an in-memory DataFrame (`df`) or, in out-of-core mode, a
+    ChunkedCSV (`lazy_source`). Rows from add_row are buffered and merged in
+    batches; aggregates are cached in `stats_cache`, ColumnIndexes and filter
+    results in `index_cache`. `row_filter` is a pandas query applied to what
+    the grid, charts, profile and export see (`view`). Invalid requests raise
+    ValueError with a message fit to show the user.
+    """
+    def __init__(self, csv_cache=None, row_buffer_limit=1000):
+        self.df = None
+        self.lazy_source = None
+        self.memory_before = None
+        self.pending_rows = []
+        self.row_buffer_limit = row_buffer_limit
+        self.stats_cache = StatsCache()
+        self.index_cache = StatsCache(max_bytes=256 * 1024 ** 2)
+        self.csv_cache = csv_cache
+        self.row_filter = None
+        self._view = None
+
+    @property
+    def has_data(self):
+        return self.df is not None or self.lazy_source is not None
+
+    @property
+    def source(self):
+        """The DataFrame (with pending rows merged) or the ChunkedCSV."""
+        if self.lazy_source is not None:
+            return self.lazy_source
+        self.flush_pending_rows()
+        return self.df
+
+    @property
+    def view(self):
+        """`source` with `row_filter` applied, keeping the original row labels.
+        A filter that stops applying after an edit is cleared (ValueError)."""
+        source = self.source
+        if self.row_filter is None:
+            return source
+        try:
+            positions = self._filter_positions(self.row_filter)
+        except Exception as e:
+            expr, self.row_filter = self.row_filter, None
+            raise ValueError(f"The filter {expr!r} no longer applies to the data and was cleared:\n{e}") from e
+        if self._view is None or self._view[0] is not positions:
+            self._view = (positions, source.take(positions))
+        return self._view[1]
+
+    def columns(self):
+        if self.df is not None:
+            return list(self.df.columns)
+        if self.lazy_source is not None:
+            return list(self.lazy_source.columns)
+        return None
+
+    def row_count(self):
+        if self.lazy_source is not None:
+            return len(self.lazy_source)
+        return len(self.df) + len(self.pending_rows) if self.df is not None else 0
+
+    def loader(self, file_paths, compact=False, out_of_core=False, source_column=None, jobs=None):
+        """A CSVLoader for one path, or a MultiCSVLoader for several (or for a
+        glob/directory); pass its result to set_data. `source_column` names
+        a column recording each row's file in multi-file loads."""
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+        file_paths = expand_paths(file_paths)
+        if not file_paths:
+            raise ValueError("No CSV files found.")
+        if len(file_paths) == 1:
+            return CSVLoader(file_paths[0], compact=compact, cache=self.csv_cache, out_of_core=out_of_core)
+        if out_of_core:
+            raise ValueError("Out-of-core mode opens one file at a time.")
+        return MultiCSVLoader(file_paths, compact=compact, cache=self.csv_cache,
+                              source_column=source_column, jobs=jobs)
+
+    def load(self, file_paths, compact=False, out_of_core=False, source_column=None, jobs=None):
+        """Loads synchronously; returns True if everything came from the cache."""
+        loader = self.loader(file_paths, compact=compact, out_of_core=out_of_core,
+                             source_column=source_column, jobs=jobs)
+        self.set_data(run_sync(loader), loader.memory_before)
+        return loader.from_cache
+
+    def set_data(self, data, memory_before=None):
+        if isinstance(data, ChunkedCSV):
+            self.df, self.lazy_source = None, data
+        else:
+            self.df, self.lazy_source = data, None
+        self.memory_before = memory_before
+        self.pending_rows.clear()
+        self.row_filter = None
+        self._view = None
+        self._invalidate()
+
+    def _invalidate(self, columns=None):
+        self.stats_cache.invalidate(columns)
+        self.index_cache.invalidate(columns)
+
+    def require_in_memory(self, feature):
+        if self.lazy_source is not None:
+            raise ValueError(f"{feature} needs the data in memory and isn't available in out-of-core mode.")
+
+    def add_column(self, name, default_value):
+        self.require_in_memory("Adding columns")
+        if name in self.df.columns:
+            raise ValueError("Column already exists.")
+        self.flush_pending_rows()
+        # A new frame (cheap under copy-on-write) rather than an in-place
+        # insert, so running jobs keep reading a consistent snapshot.
+        self.df = self.df.assign(**{name: default_value})
+        self._invalidate([name])
+
+    def add_row(self, row):
+        """Buffers `row` (a column -> value dict); missing columns get NaN."""
+        self.require_in_memory("Adding rows")
+        self.pending_rows.append({col: row[col] for col in self.df.columns if col in row})
+        if len(self.pending_rows) >= self.row_buffer_limit:
+            self.flush_pending_rows()
+
+    def flush_pending_rows(self):
+        """Merges rows buffered by add_row into the DataFrame with a single
+        concat, after casting them to the existing column dtypes."""
+        if not self.pending_rows:
+            return
+        new_rows = pd.DataFrame(self.pending_rows, columns=self.df.columns, dtype=object)
+        df = self.df
+        for col in df.columns:
+            column = df[col]
+            new_rows[col], conformed = conform_column(new_rows[col], column)
+            if conformed is not column:
+                df = df.assign(**{col: conformed})
+        self.df = pd.concat([df, new_rows], ignore_index=True)
+        self.pending_rows.clear()
+        self._invalidate()
+
+    def column_index(self, col):
+        """The ColumnIndex for `col`, or None when filtering it should scan.
+
+        The first filter on a column scans it; the index is built the second
+        time, and only if it fits the index cache budget (building one that
+        can't be kept would cost a full argsort per filter). It is kept until
+        `col` changes.
+        """
+        index = self.index_cache.get("index", col)
+        if index is not None:
+            return index
+        series = self.source[col]
+        if self.index_cache.get("filtered", col) is None or \
+                ColumnIndex.estimated_nbytes(series) > self.index_cache.max_bytes:
+            self.index_cache.put("filtered", col, True)
+            return None
+        return self.index_cache.get_or_compute("index", col, lambda: ColumnIndex(series))
+
+    def _filter_positions(self, expr):
+        source = self.source
+        return self.index_cache.get_or_compute(("filter", expr), None,
+                                               lambda: filter_positions(source, expr, self.column_index))
+
+    def set_filter(self, expr):
+        """Applies the pandas query `expr` (None or blank clears it) and returns
+        the number of matching rows."""
+        expr = (expr or "").strip() or None
+        if expr is not None:
+            self.require_in_memory("Filtering")
+            try:
+                count = len(self._filter_positions(expr))
+            except Exception as e:
+                raise ValueError(f"Invalid filter: {e}") from e
+        self.row_filter = expr
+        return self.row_count() if expr is None else count
+
+    def filter_condition(self, col, op, text):
+        """Query text for one condition of the filter builder (see filter_condition)."""
+        self.require_in_memory("Filtering")
+        self._check_column(col)
+        return filter_condition(self.source[col], op, text)
+
+    def _check_column(self, col):
+        if col is not None and col not in self.columns():
+            raise ValueError(f"Column '{col}' not found.")
+
+    def _cached(self, kind, col):
+        self.flush_pending_rows()
+        return self.stats_cache.get(kind, col)
+
+    def top_values(self, col, n=10):
+        """Cached top-n value counts for `col`, or across all columns when None.
+        In out-of-core mode the counts are streamed from the file."""
+        view = self.view
+        self._check_column(col)
+        return self.stats_cache.get_or_compute(("top_values", n, self.row_filter), col,
+                                               lambda: compute_top_values(view, col, n))
+
+    def chart_job(self, kind, col=None, n=10, buckets=1000, time_col=None):
+        """A ChartJob computing the data for a chart; store its result with
+        store_chart_data. `buckets` is the time-series width in pixels and
+        `time_col` its x axis (row order when None)."""
+        self._check_column(col)
+        self._check_column(time_col)
+        time_col = time_col if kind == "timeseries" else None
+        return ChartJob(self.view, kind, col, n, buckets, version=self.stats_cache.version,
+                        cache_key=("chart", kind, n, buckets, time_col, self.row_filter), time_col=time_col)
+
+    def cached_chart_data(self, kind, col=None, n=10, buckets=1000, time_col=None):
+        time_col = time_col if kind == "timeseries" else None
+        return self._cached(("chart", kind, n, buckets, time_col, self.row_filter), col)
+
+    def store_chart_data(self, job, data):
+        self.stats_cache.put(job.cache_key, job.column, data, job.version)
+
+    def chart_data(self, kind, col=None, n=10, buckets=1000, time_col=None):
+        """compute_chart_data for the loaded data, cached until it changes."""
+        data = self.cached_chart_data(kind, col, n, buckets, time_col)
+        if data is None:
+            job = self.chart_job(kind, col, n, buckets, time_col)
+            data = run_sync(job)
+            self.store_chart_data(job, data)
+        return data
+
+    def chart(self, kind, col=None, n=10, buckets=1000, time_col=None):
+        return build_chart_figure(self.chart_data(kind, col, n, buckets, time_col))
+
+    def groupby_job(self, keys, values, aggregations, pivot=False):
+        """A GroupByJob aggregating `values` by `keys`; store its result with
+        store_groupby."""
+        if not keys or not values or not aggregations:
+            raise ValueError("Pick at least one key column, one value column and one aggregation.")
+        for col in list(keys) + list(values):
+            self._check_column(col)
+        if set(keys) & set(values):
+            raise ValueError("A column can't be both a key and a value.")
+        unknown = [agg for agg in aggregations if agg not in GROUP_AGGREGATIONS]
+        if unknown:
+            raise ValueError(f"Unknown aggregation '{unknown[0]}'.")
+        view = self.view
+        if not isinstance(view, ChunkedCSV) and any(agg not in ("count", "nunique") for agg in aggregations):
+            for col in values:
+                dtype = view[col].dtype
+                if not pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+                    raise ValueError(f"Column '{col}' is not numeric; only count and nunique apply to it.")
+        return GroupByJob(view, keys, values, aggregations, pivot, version=self.stats_cache.version,
+                          cache_key=("groupby", tuple(keys), tuple(values), tuple(aggregations), pivot,
+                                     self.row_filter))
+
+    def cached_groupby(self, keys, values, aggregations, pivot=False):
+        return self._cached(("groupby", tuple(keys), tuple(values), tuple(aggregations), pivot, self.row_filter),
+                            None)
+
+    def store_groupby(self, job, result):
+        self.stats_cache.put(job.cache_key, None, result, job.version)
+
+    def groupby(self, keys, values, aggregations, pivot=False):
+        """The group-by result DataFrame, cached until the data changes."""
+        result = self.cached_groupby(keys, values, aggregations, pivot)
+        if result is None:
+            job = self.groupby_job(keys, values, aggregations, pivot)
+            result = run_sync(job)
+            self.store_groupby(job, result)
+        return result
+
+    def memory_report(self):
+        """Per-column dtype and memory, with the default-load estimate after a compact load."""
+        self.require_in_memory("Memory usage")
+        df = self.source
+        after = df.memory_usage(deep=True, index=False)
+        report = pd.DataFrame({"column": list(df.columns), "dtype": [str(dtype) for dtype in df.dtypes],
+                               "before": np.nan, "after": after.to_numpy()})
+        if self.memory_before is not None:
+            report["before"] = [self.memory_before.get(col, np.nan) for col in df.columns]
+        return report
+
+    def profiler(self, columns=None):
+        """A ProfileJob for `columns` (default all); store its results with store_profile."""
+        return ProfileJob(self.view, columns, version=self.stats_cache.version,
+                          cache_key=("profile", self.row_filter))
+
+    def cached_profile(self, col):
+        """The cached stats for `col`, or None; buffered rows are merged first
+        so the answer reflects them."""
+        return self._cached(("profile", self.row_filter), col)
+
+    def store_profile(self, job, col, stats):
+        self.stats_cache.put(job.cache_key, col, stats, job.version)
+
+    def profile(self):
+        """{column: stats} for every column (see ColumnProfiler.result), reusing cached columns."""
+        results = {col: self.cached_profile(col) for col in self.columns()}
+        missing = [col for col, stats in results.items() if stats is None]
+        if missing:
+            job = self.profiler(missing)
+            for col, stats in run_sync(job).items():
+                self.store_profile(job, col, stats)
+                results[col] = stats
+        return results
+
+    def exporter(self, file_path):
+        """A DataFrameExporter writing the current (filtered) data to `file_path`."""
+        return DataFrameExporter(self.view, file_path)
+
+    def export(self, file_path, on_progress=None):
+        return run_sync(self.exporter(file_path), on_progress)
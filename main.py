@@ -1,8 +1,18 @@
+import os
+import queue
+import threading
 import tkinter as tk
+from datetime import datetime
 from tkinter import filedialog, messagebox, ttk
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+from tracing import operations
+from engine import (CHART_NAMES, FILTER_OPS, GROUP_AGGREGATIONS, HAS_PYARROW, AnalysisEngine, ChunkedCSV,
+                    ParsedCSVCache, chart_title, draw_chart, format_bytes, grouped_chart_data, peak_memory_bytes)
+
+ROW_ORDER = "Row order"
 
 class ScrollableFrame(tk.Frame):
     """A scrollable frame class with mouse wheel support."""
@@ -34,13 +44,525 @@ class ScrollableFrame(tk.Frame):
         elif event.num == 5 or event.delta < 0:
             self.canvas.yview_scroll(1, "units")
 
+class DataGrid(tk.Frame):
+    """A table view that only materialises the rows currently on screen.
+
+    The Treeview always holds `visible_rows` items; scrolling, sorting and
+    jumping only change which slice of the DataFrame (or ChunkedCSV) is
+    copied into them.
+    """
+    def __init__(self, container, visible_rows=20, *args, **kwargs):
+        super().__init__(container, *args, **kwargs)
+        self.visible_rows = visible_rows
+        self.df = None
+        self.column_positions = []
+        self.order = None
+        self.offset = 0
+        self.sort_position = None
+        self.sort_ascending = True
+
+        toolbar = tk.Frame(self, bg="white")
+        toolbar.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 5))
+        self.range_label = tk.Label(toolbar, text="No data", font=("Segoe UI", 10), bg="white")
+        self.range_label.pack(side="left")
+        ttk.Button(toolbar, text="Go", command=self._on_jump).pack(side="right")
+        self.jump_entry = tk.Entry(toolbar, width=12)
+        self.jump_entry.pack(side="right", padx=5)
+        self.jump_entry.bind("<Return>", lambda e: self._on_jump())
+        tk.Label(toolbar, text="Go to row:", font=("Segoe UI", 10), bg="white").pack(side="right")
+
+        self.tree = ttk.Treeview(self, show="headings", height=visible_rows, selectmode="browse")
+        self.vscroll = tk.Scrollbar(self, orient="vertical", command=self._on_vscroll)
+        self.hscroll = tk.Scrollbar(self, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.hscroll.set)
+        self.tree.grid(row=1, column=0, sticky="nsew")
+        self.vscroll.grid(row=1, column=1, sticky="ns")
+        self.hscroll.grid(row=2, column=0, sticky="ew")
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self._on_mousewheel)
+        self.tree.bind("<Prior>", lambda e: self._scroll_keys(-self.visible_rows))
+        self.tree.bind("<Next>", lambda e: self._scroll_keys(self.visible_rows))
+        self.tree.bind("<Home>", lambda e: self._scroll_keys(-len(self.df) if self.df is not None else 0))
+        self.tree.bind("<End>", lambda e: self._scroll_keys(len(self.df) if self.df is not None else 0))
+
+    def set_data(self, df, column_positions):
+        self.df = df
+        self.column_positions = list(column_positions)
+        self.order = None
+        self.offset = 0
+        self.sort_position = None
+        self.sort_ascending = True
+
+        ids = [f"c{i}" for i in range(len(self.column_positions) + 1)]
+        self.tree["columns"] = ids
+        self.tree.heading(ids[0], text="#", command=lambda: self.sort_by(None))
+        self.tree.column(ids[0], width=70, minwidth=50, stretch=False, anchor="e")
+        for item_id, pos in zip(ids[1:], self.column_positions):
+            self.tree.heading(item_id, text=str(df.columns[pos]), command=lambda p=pos: self.sort_by(p))
+            self.tree.column(item_id, width=120, minwidth=60, stretch=True, anchor="w")
+        self.render()
+
+    def clear(self):
+        self.df = None
+        self.order = None
+        self.offset = 0
+        self.tree.delete(*self.tree.get_children())
+        self.tree["columns"] = ()
+        self.range_label.config(text="No data")
+        self.vscroll.set(0, 1)
+
+    def render(self):
+        self.tree.delete(*self.tree.get_children())
+        if self.df is None:
+            return
+        total = len(self.df)
+        stop = min(self.offset + self.visible_rows, total)
+        if isinstance(self.df, ChunkedCSV):
+            window = self.df.take_rows(self.offset, stop, self.column_positions)
+        else:
+            rows = self.order[self.offset:stop] if self.order is not None else np.arange(self.offset, stop)
+            window = self.df.iloc[rows, self.column_positions]
+        for label, values in zip(window.index, window.itertuples(index=False, name=None)):
+            self.tree.insert("", "end", values=(label, *values))
+
+        if total:
+            self.range_label.config(text=f"Rows {self.offset + 1:,}-{stop:,} of {total:,}")
+            self.vscroll.set(self.offset / total, stop / total)
+        else:
+            self.range_label.config(text="No rows")
+            self.vscroll.set(0, 1)
+
+    def scroll_to(self, offset):
+        if self.df is None:
+            return
+        max_offset = max(len(self.df) - self.visible_rows, 0)
+        offset = min(max(int(offset), 0), max_offset)
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def sort_by(self, position):
+        if self.df is None:
+            return
+        if isinstance(self.df, ChunkedCSV):
+            messagebox.showinfo("Info", "Sorting needs the data in memory and isn't available in out-of-core mode.")
+            return
+        if position == self.sort_position:
+            self.sort_ascending = not self.sort_ascending
+        else:
+            self.sort_position = position
+            self.sort_ascending = True
+
+        if position is None:
+            self.order = None if self.sort_ascending else np.arange(len(self.df) - 1, -1, -1)
+        else:
+            series = self.df.iloc[:, position].reset_index(drop=True)
+            try:
+                ordered = series.sort_values(ascending=self.sort_ascending, kind="stable", na_position="last")
+            except TypeError:
+                ordered = series.astype(str).sort_values(ascending=self.sort_ascending, kind="stable")
+            self.order = ordered.index.to_numpy()
+        self.offset = 0
+        self.render()
+
+    def jump_to_row(self, row):
+        """Scrolls so that positional row `row` of the DataFrame is at the top."""
+        if self.df is None or not 0 <= row < len(self.df):
+            return False
+        offset = row if self.order is None else int(np.flatnonzero(self.order == row)[0])
+        self.scroll_to(offset)
+        children = self.tree.get_children()
+        index = offset - self.offset
+        if 0 <= index < len(children):
+            self.tree.selection_set(children[index])
+        return True
+
+    def jump_to_label(self, label):
+        """Scrolls to the row shown as `label` in the "#" column; a filtered
+        view keeps the original row numbers, so labels aren't positions."""
+        if self.df is None or isinstance(self.df, ChunkedCSV):
+            return self.jump_to_row(label)
+        try:
+            position = self.df.index.get_loc(label)
+        except (KeyError, TypeError):
+            return False
+        if isinstance(position, slice):
+            position = position.start
+        elif not isinstance(position, (int, np.integer)):
+            position = int(np.flatnonzero(position)[0])
+        return self.jump_to_row(int(position))
+
+    def _on_jump(self):
+        text = self.jump_entry.get().strip().replace(",", "")
+        if not text.isdigit() or not self.jump_to_label(int(text)):
+            messagebox.showwarning("Input Error", "Enter a row number shown in the # column.")
+
+    def _on_vscroll(self, *args):
+        if self.df is None:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * len(self.df))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible_rows
+            self.scroll_to(self.offset + amount)
+
+    def _on_mousewheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.offset - 3)
+        elif event.num == 5 or event.delta < 0:
+            self.scroll_to(self.offset + 3)
+        return "break"
+
+    def _scroll_keys(self, amount):
+        self.scroll_to(self.offset + amount)
+        return "break"
+
+
+class ColumnPicker(tk.Frame):
+    """A searchable list of column checkboxes that only materialises the
+    items on screen.
+
+    A fixed pool of `visible_lines` x `per_line` Checkbuttons (each with an
+    Entry when `with_values` is set) is reused while scrolling; which columns
+    are checked and what was typed for them is kept in plain Python state, so
+    adding a column appends to a list instead of rebuilding widgets.
+    """
+    def __init__(self, container, per_line=3, visible_lines=8, with_values=False, *args, **kwargs):
+        super().__init__(container, *args, **kwargs)
+        self.per_line = per_line
+        self.visible_lines = visible_lines
+        self.with_values = with_values
+        self.columns = []
+        self.matches = []
+        self.checked = set()
+        self.values = {}
+        self.offset = 0
+
+        toolbar = tk.Frame(self, bg="white")
+        toolbar.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 5))
+        tk.Label(toolbar, text="Search:", font=("Segoe UI", 10), bg="white").pack(side="left")
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self._apply_search())
+        tk.Entry(toolbar, textvariable=self.search_var, width=24).pack(side="left", padx=5)
+        ttk.Button(toolbar, text="Clear", command=self.clear_selection).pack(side="right")
+        if not with_values:
+            ttk.Button(toolbar, text="Select Matching", command=self.select_matching).pack(side="right", padx=5)
+        self.count_label = tk.Label(toolbar, font=("Segoe UI", 10), fg="gray", bg="white")
+        self.count_label.pack(side="left", padx=5)
+
+        self.items_frame = tk.Frame(self, bg="white")
+        self.items_frame.grid(row=1, column=0, sticky="nsew")
+        self.vscroll = tk.Scrollbar(self, orient="vertical", command=self._on_vscroll)
+        self.vscroll.grid(row=1, column=1, sticky="ns")
+        self.grid_columnconfigure(0, weight=1)
+
+        self.slots = []
+        for i in range(visible_lines * per_line):
+            slot = tk.Frame(self.items_frame, bg="white")
+            check_var = tk.BooleanVar(value=False)
+            check = tk.Checkbutton(slot, variable=check_var, bg="white", anchor="w", width=28 if with_values else 24,
+                                   command=lambda i=i: self._on_check(i))
+            check.pack(side="left")
+            widgets = [slot, check]
+            entry = entry_var = None
+            if with_values:
+                entry_var = tk.StringVar()
+                entry = tk.Entry(slot, textvariable=entry_var, width=25)
+                entry.pack(side="left", padx=5)
+                entry_var.trace_add("write", lambda *args, i=i: self._on_value(i))
+                widgets.append(entry)
+            for widget in widgets:
+                for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+                    widget.bind(sequence, self._on_mousewheel)
+            self.slots.append({"frame": slot, "column": None, "check": check, "check_var": check_var,
+                               "entry": entry, "entry_var": entry_var})
+        self.render()
+
+    def set_columns(self, columns):
+        """Replaces the columns, clearing the selection, values and search."""
+        self.columns = list(columns)
+        self.checked.clear()
+        self.values.clear()
+        self.offset = 0
+        if self.search_var.get():
+            self.search_var.set("")
+        else:
+            self._apply_search()
+
+    def add_column(self, col):
+        """Appends one column; only the visible slots are refreshed."""
+        self.columns.append(col)
+        if self._matches(col):
+            self.matches.append(col)
+        self.render()
+
+    def selected(self):
+        """Checked columns, in column order."""
+        return [col for col in self.columns if col in self.checked]
+
+    def selected_values(self):
+        """{column: typed value} for the checked columns."""
+        return {col: self.values.get(col, "") for col in self.selected()}
+
+    def select_matching(self):
+        self.checked.update(self.matches)
+        self.render()
+
+    def clear_selection(self):
+        self.checked.clear()
+        self.values.clear()
+        self.render()
+
+    def _matches(self, col):
+        text = self.search_var.get().strip().lower()
+        return not text or text in str(col).lower()
+
+    def _apply_search(self):
+        self.matches = [col for col in self.columns if self._matches(col)]
+        self.offset = 0
+        self.render()
+
+    def render(self):
+        start = self.offset * self.per_line
+        for i, slot in enumerate(self.slots):
+            index = start + i
+            if index >= len(self.matches):
+                slot["column"] = None
+                slot["frame"].grid_remove()
+                continue
+            col = self.matches[index]
+            # Point the slot at its column before setting the variables, so
+            # the write traces store into the right column.
+            slot["column"] = col
+            slot["check"].config(text=str(col))
+            slot["check_var"].set(col in self.checked)
+            if self.with_values and slot["entry_var"].get() != self.values.get(col, ""):
+                slot["entry_var"].set(self.values.get(col, ""))
+            slot["frame"].grid(row=i // self.per_line, column=i % self.per_line, sticky="w", padx=10, pady=3)
+
+        lines = -(-len(self.matches) // self.per_line)
+        if lines > self.visible_lines:
+            self.vscroll.set(self.offset / lines, min(self.offset + self.visible_lines, lines) / lines)
+        else:
+            self.vscroll.set(0, 1)
+        shown = f"{len(self.matches):,} of {len(self.columns):,}" if len(self.matches) != len(self.columns) \
+            else f"{len(self.columns):,}"
+        self.count_label.config(text=f"{shown} columns, {len(self.checked):,} selected")
+
+    def scroll_to(self, offset):
+        lines = -(-len(self.matches) // self.per_line)
+        offset = min(max(int(offset), 0), max(lines - self.visible_lines, 0))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def _on_check(self, i):
+        slot = self.slots[i]
+        if slot["column"] is None:
+            return
+        if slot["check_var"].get():
+            self.checked.add(slot["column"])
+        else:
+            self.checked.discard(slot["column"])
+        self.render()
+
+    def _on_value(self, i):
+        slot = self.slots[i]
+        if slot["column"] is not None:
+            self.values[slot["column"]] = slot["entry_var"].get()
+
+    def _on_vscroll(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * -(-len(self.matches) // self.per_line))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible_lines
+            self.scroll_to(self.offset + amount)
+
+    def _on_mousewheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.offset - 1)
+        elif event.num == 5 or event.delta < 0:
+            self.scroll_to(self.offset + 1)
+        return "break"
+
+
+class ColumnChooser(ttk.Combobox):
+    """A one-column drop-down that can be typed into to narrow its list.
+
+    The list shows the columns containing the typed text, at most `max_items`
+    of them, so it stays usable with thousands of columns. Picking an item, or
+    pressing Enter on a name (or on text only one column matches), sets
+    `variable`. Columns are kept in a plain list, so add_column appends
+    instead of rebuilding the widget.
+    """
+    def __init__(self, container, variable, fixed=(), max_items=500, **kwargs):
+        super().__init__(container, postcommand=self._fill_list, **kwargs)
+        self.variable = variable
+        self.fixed = list(fixed)
+        self.max_items = max_items
+        self.columns = []
+        self.known = set()
+        self.bind("<<ComboboxSelected>>", lambda event: self._commit())
+        self.bind("<Return>", lambda event: self._commit())
+        self.bind("<FocusOut>", lambda event: self.set(self.variable.get()))
+
+    def set_columns(self, columns, choice=None):
+        """Replaces the columns and selects `choice`, or the first one."""
+        self.columns = list(columns)
+        self.known = set(self.fixed) | set(self.columns)
+        choices = self.fixed + self.columns
+        self.variable.set(choice if choice is not None else choices[0] if choices else "")
+        self.set(self.variable.get())
+
+    def add_column(self, col):
+        self.columns.append(col)
+        self.known.add(col)
+
+    def _matches(self):
+        """Columns containing the typed text; all of them while the box is
+        empty or still shows the current choice."""
+        text = self.get().strip().lower()
+        if not text or self.get() == self.variable.get():
+            return self.columns
+        return [col for col in self.columns if text in str(col).lower()]
+
+    def _fill_list(self):
+        matches = self._matches()
+        fixed = self.fixed if matches is self.columns else []
+        more = len(matches) - self.max_items
+        self["values"] = fixed + matches[:self.max_items] + \
+            ([f"({more:,} more; type to narrow the list)"] if more > 0 else [])
+
+    def _commit(self):
+        text = self.get()
+        if text not in self.known:
+            matches = self._matches()
+            text = matches[0] if len(matches) == 1 else self.variable.get()
+        self.set(text)
+        if text != self.variable.get():
+            self.variable.set(text)
+
+
+class TracedCanvas(FigureCanvasTkAgg):
+    """Times every full matplotlib render as a "matplotlib_draw" span."""
+    def draw(self):
+        with operations.span("matplotlib_draw"):
+            super().draw()
+
+
+class ChartView(tk.Frame):
+    """One Figure and FigureCanvasTkAgg reused for every chart.
+
+    A chart with the same layout as the one on screen (same kind and column,
+    same bars) only has its bar heights or line data replaced. If the new data
+    still fits the axes, just those artists are redrawn over the background
+    saved at the last full draw and blitted; otherwise the axes rescale and the
+    canvas redraws once. A different layout redraws the figure, still without
+    recreating the canvas.
+    """
+    def __init__(self, container, *args, **kwargs):
+        super().__init__(container, *args, **kwargs)
+        self.figure = Figure(figsize=(8, 5))
+        self.canvas = TracedCanvas(self.figure, master=self)
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self.layout = None
+        self.artists = []
+        self.background = None
+
+    def clear(self):
+        self.figure.clear()
+        self.layout = None
+        self.artists = []
+        self.canvas.draw_idle()
+
+    @operations.traced("build_chart")
+    def show(self, data):
+        layout = self._layout(data)
+        if layout is not None and layout == self.layout:
+            self._update(data)
+            return
+        self.artists = draw_chart(self.figure, data)
+        for artist in self.artists:
+            artist.set_animated(True)
+        self.layout = layout
+        self.canvas.draw_idle()
+
+    @staticmethod
+    def _layout(data):
+        kind = data["kind"]
+        if kind in ("bar", "grouped"):
+            return kind, data["column"], tuple(str(value) for value in data["counts"].index)
+        if kind == "hist":
+            return kind, data["column"], len(data["counts"])
+        if kind == "timeseries":
+            return kind, data["column"], data.get("time_column")
+        return None
+
+    def _update(self, data):
+        ax = self.figure.axes[0]
+        if data["kind"] == "timeseries":
+            x, y = data["x"], data["y"]
+            self.artists[0].set_data(x, y)
+            x_range, y_range = (ax.convert_xunits(x[0]), ax.convert_xunits(x[-1])), (np.nanmin(y), np.nanmax(y))
+        else:
+            counts = np.asarray(data["counts"])
+            for patch, height in zip(self.artists, counts):
+                patch.set_height(height)
+            if data["kind"] == "hist":
+                edges = data["edges"]
+                for patch, left, width in zip(self.artists, edges[:-1], np.diff(edges)):
+                    patch.set_x(left)
+                    patch.set_width(width)
+                x_range = (edges[0], edges[-1])
+            else:
+                x_range = ax.get_xlim()
+            y_range = (0, counts.max())
+
+        title = chart_title(data)
+        (left, right), (bottom, top) = ax.get_xlim(), ax.get_ylim()
+        fits = left <= x_range[0] and x_range[1] <= right and bottom <= y_range[0] and y_range[1] <= top
+        if fits and title == ax.get_title() and self.background is not None:
+            self.canvas.restore_region(self.background)
+            self._draw_artists()
+            self.canvas.blit(self.figure.bbox)
+        else:
+            ax.set_title(title)
+            ax.relim()
+            ax.autoscale_view()
+            self.canvas.draw_idle()
+
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for artist in self.artists:
+            self.figure.draw_artist(artist)
+
+
 class CSVAnalyzerApp:
     def __init__(self, root):
         self.root = root
         self.root.title("CSV Analyzer")
         self.root.geometry("850x750")
         self.root.configure(bg="white")
-        self.df = None
+        self.engine = AnalysisEngine(csv_cache=ParsedCSVCache())
+        self.loader = None
+        self.worker = None
+        self.progress_dialog = None
+        self.profile_job = None
+        self.chart_job = None
+        self.chart_kind = None
+        self.group_job = None
+        self._chart_after_id = None
 
         self.style = ttk.Style(self.root)
         self.style.theme_use('clam')
@@ -66,6 +588,19 @@ class CSVAnalyzerApp:
                                   font=("Segoe UI", 10, "italic"), fg="gray", bg="white")
         self.top_watermark.pack(side="top", pady=5)
 
+        # --- STATUS BAR: last operation ---
+        status_bar = tk.Frame(root, bg="#f0f0f0")
+        status_bar.pack(side="bottom", fill="x")
+        self.last_operation_label = tk.Label(status_bar, text="Last operation: none", font=("Segoe UI", 9),
+                                             fg="#333333", bg="#f0f0f0", anchor="w")
+        self.last_operation_label.pack(side="left", fill="x", expand=True, padx=8, pady=2)
+        ttk.Button(status_bar, text="Operations Log", command=self.show_operations_log).pack(side="right", padx=4, pady=2)
+        self.ops_window = None
+        self.ops_tree = None
+        self.ops_profile_var = tk.BooleanVar(value=operations.profile)
+        self.ops_memory_var = tk.BooleanVar(value=operations.trace_memory)
+        operations.listeners.append(self._on_operation_finished)
+
         # Initial centered upload button frame
         self.upload_frame = tk.Frame(root, bg="white")
         self.upload_frame.place(relx=0.5, rely=0.5, anchor="center")
@@ -79,6 +614,11 @@ class CSVAnalyzerApp:
                                      command=self.load_csv)
         self.upload_btn.pack(ipadx=30, ipady=12)
 
+        self.compact_load_var = tk.BooleanVar(value=False)
+        self.out_of_core_var = tk.BooleanVar(value=False)
+        self.source_column_var = tk.BooleanVar(value=False)
+        self._add_load_options(self.upload_frame).pack(pady=(10, 0))
+
         # Features Frame hidden initially
         self.features_frame = tk.Frame(root, bg="white")
 
@@ -90,6 +630,9 @@ class CSVAnalyzerApp:
         # Buttons frame in features frame - 3 column grid
         self.features_btn_frame = tk.Frame(self.features_frame, bg="white")
         self.features_btn_frame.pack(pady=15, padx=10, anchor="center")
+        self._add_load_options(self.features_frame).pack()
+        self.mode_label = tk.Label(self.features_frame, font=("Segoe UI", 10, "italic"), fg="#d35400",
+                                   bg="white", wraplength=760, justify="center")
 
         self.buttons_data = [
             ("Upload CSV", self.load_csv),
@@ -99,6 +642,7 @@ class CSVAnalyzerApp:
             ("Add Row", self.toggle_add_row_section),
             ("Export CSV", self.export_csv),
             ("Visualize Data", self.toggle_visualize_section),
+            ("Profile Columns", self.toggle_profile_section),
         ]
         self.feature_buttons = []
         for i, (text, cmd) in enumerate(self.buttons_data):
@@ -106,6 +650,31 @@ class CSVAnalyzerApp:
             btn.grid(row=i//3, column=i%3, padx=10, pady=8, sticky="ew")
             self.feature_buttons.append(btn)
 
+        filter_frame = tk.Frame(self.features_frame, bg="white")
+        filter_frame.pack(fill="x", padx=20, pady=(5, 0))
+        query_row = tk.Frame(filter_frame, bg="white")
+        query_row.pack(fill="x")
+        tk.Label(query_row, text="Filter:", font=("Segoe UI", 11, "bold"), bg="white").pack(side="left")
+        self.filter_entry = tk.Entry(query_row, font=("Segoe UI", 11))
+        self.filter_entry.pack(side="left", fill="x", expand=True, padx=5)
+        self.filter_entry.bind("<Return>", lambda e: self.apply_filter())
+        ttk.Button(query_row, text="Apply", command=self.apply_filter).pack(side="left")
+        ttk.Button(query_row, text="Clear", command=self.clear_filter).pack(side="left", padx=(5, 0))
+        builder_row = tk.Frame(filter_frame, bg="white")
+        builder_row.pack(fill="x", pady=(5, 0))
+        self.filter_column_var = tk.StringVar()
+        self.filter_column_box = ttk.Combobox(builder_row, textvariable=self.filter_column_var, state="readonly", width=22)
+        self.filter_column_box.pack(side="left")
+        self.filter_op_var = tk.StringVar(value="==")
+        ttk.Combobox(builder_row, textvariable=self.filter_op_var, values=FILTER_OPS, state="readonly",
+                     width=7).pack(side="left", padx=5)
+        self.filter_value_entry = tk.Entry(builder_row, width=24)
+        self.filter_value_entry.pack(side="left")
+        self.filter_value_entry.bind("<Return>", lambda e: self.add_filter_condition())
+        ttk.Button(builder_row, text="Add Condition", command=self.add_filter_condition).pack(side="left", padx=5)
+        self.filter_status = tk.Label(filter_frame, font=("Segoe UI", 10, "italic"), fg="gray", bg="white", anchor="w")
+        self.filter_status.pack(fill="x")
+
         self.sections_scrollable = ScrollableFrame(self.features_frame)
         self.sections_scrollable.pack(fill="both", expand=True, padx=10, pady=10)
 
@@ -115,19 +684,28 @@ class CSVAnalyzerApp:
         self._add_section_title(self.show_columns_section, "Available Columns", self.toggle_show_columns_section)
         self.columns_listbox = tk.Listbox(self.show_columns_section, height=15, font=("Segoe UI", 10))
         self.columns_listbox.pack(fill="both", expand=True, padx=15, pady=8)
+        self.memory_label = tk.Label(self.show_columns_section, text="Memory Usage",
+                                     font=("Segoe UI", 12, "bold"), bg="white")
+        self.memory_label.pack(anchor="w", padx=15)
+        self.memory_report = ttk.Treeview(self.show_columns_section, show="headings", height=8,
+                                          columns=("column", "dtype", "before", "after"))
+        for col_id, heading, width in (("column", "Column", 200), ("dtype", "Dtype", 120),
+                                       ("before", "Default Load", 120), ("after", "Current", 120)):
+            self.memory_report.heading(col_id, text=heading)
+            self.memory_report.column(col_id, width=width, anchor="w" if col_id == "column" else "e")
+        self.memory_report.pack(fill="both", expand=True, padx=15, pady=(0, 8))
         self.show_columns_section.pack_forget()
 
         self.show_column_data_section = tk.Frame(container, relief=tk.RIDGE, borderwidth=2, bg="white")
         self._add_section_title(self.show_column_data_section, "Select Columns to Show Data", self.toggle_show_column_data_section)
-        self.checkbox_frame = tk.Frame(self.show_column_data_section, bg="white")
-        self.checkbox_frame.pack(fill="x", padx=15)
+        self.column_picker = ColumnPicker(self.show_column_data_section, per_line=3, bg="white")
+        self.column_picker.pack(fill="x", padx=15)
         self.show_data_btn = ttk.Button(self.show_column_data_section, text="Show Selected Column Data",
                                         command=self.show_selected_column_data, style="Glass.TButton")
         self.show_data_btn.pack(pady=8)
-        self.column_data_text = tk.Text(self.show_column_data_section, height=20, font=("Segoe UI", 10))
-        self.column_data_text.pack(fill="both", expand=True, padx=15, pady=10)
+        self.column_grid = DataGrid(self.show_column_data_section, bg="white")
+        self.column_grid.pack(fill="both", expand=True, padx=15, pady=10)
         self.show_column_data_section.pack_forget()
-        self.checkbox_vars = []
 
         self.add_column_section = tk.Frame(container, relief=tk.RIDGE, borderwidth=2, bg="white")
         self._add_section_title(self.add_column_section, "Add New Column", self.toggle_add_column_section)
@@ -147,32 +725,114 @@ class CSVAnalyzerApp:
 
         self.add_row_section = tk.Frame(container, relief=tk.RIDGE, borderwidth=2, bg="white")
         self._add_section_title(self.add_row_section, "Add New Row", self.toggle_add_row_section)
-        self.row_checkbox_frame = tk.Frame(self.add_row_section, bg="white")
-        self.row_checkbox_frame.pack(fill="x", padx=20, pady=15)
+        self.row_picker = ColumnPicker(self.add_row_section, per_line=2, with_values=True, bg="white")
+        self.row_picker.pack(fill="x", padx=20, pady=15)
 
         ttk.Button(self.add_row_section, text="Add Row", command=self.add_row, style="Glass.TButton").pack(pady=15)
         self.add_row_section.pack_forget()
 
-        self.row_entry_widgets = {}
-
         self.visualize_section = tk.Frame(container, relief=tk.RIDGE, borderwidth=2, bg="white")
         self._add_section_title(self.visualize_section, "Visualize Data", self.toggle_visualize_section)
 
         self.visualize_column_var = tk.StringVar()
-        self.visualize_dropdown = None
-        self.visualize_label = None  
+        self.visualize_column_var.trace_add("write", self._on_chart_column_changed)
+        self.visualize_label = ttk.Label(self.visualize_section, text="Select Column (type to search):",
+                                         font=("Segoe UI", 12), background="white")
+        self.visualize_dropdown = ColumnChooser(self.visualize_section, self.visualize_column_var,
+                                                fixed=["All Columns"], width=40)
+        self.time_column_var = tk.StringVar()
+        self.time_column_var.trace_add("write", self._on_time_column_changed)
+        self.time_column_frame = tk.Frame(self.visualize_section, bg="white")
+        ttk.Label(self.time_column_frame, text="Time series x axis:", font=("Segoe UI", 10),
+                  background="white").pack(side="left")
+        self.time_column_dropdown = ColumnChooser(self.time_column_frame, self.time_column_var,
+                                                  fixed=[ROW_ORDER], width=30)
+        self.time_column_dropdown.pack(side="left", padx=5)
 
         self.visualize_buttons_title = tk.Label(self.visualize_section, text="Select Chart Type",
                                                 font=("Segoe UI", 14, "bold"), fg="#3a86ff", bg="white")
 
         self.visualize_btn_frame = tk.Frame(self.visualize_section, bg="white")
-        self.visualize_canvas_frame = tk.Frame(self.visualize_section, bg="white")
+        for i, (kind, text) in enumerate((("bar", "Bar Chart"), ("pie", "Pie Chart"),
+                                          ("hist", "Histogram"), ("timeseries", "Time Series"))):
+            ttk.Button(self.visualize_btn_frame, text=text, command=lambda kind=kind: self.show_chart(kind),
+                       style="Glass.TButton").grid(row=0, column=i, padx=10)
+        self.chart_status = tk.Label(self.visualize_section, font=("Segoe UI", 10, "italic"), fg="gray", bg="white")
+        self.chart_view = ChartView(self.visualize_section, bg="white")
+
+        self.group_frame = tk.Frame(self.visualize_section, bg="white")
+        tk.Label(self.group_frame, text="Group By / Pivot", font=("Segoe UI", 14, "bold"), fg="#3a86ff",
+                 bg="white").pack(pady=(10, 5))
+        pickers = tk.Frame(self.group_frame, bg="white")
+        pickers.pack(fill="x", padx=10)
+        self.group_key_list = self._add_column_picker(pickers, "Key columns", 0)
+        self.group_value_list = self._add_column_picker(pickers, "Value columns", 1)
+        agg_frame = tk.Frame(pickers, bg="white")
+        agg_frame.grid(row=0, column=2, sticky="nw", padx=10)
+        tk.Label(agg_frame, text="Aggregations", font=("Segoe UI", 10, "bold"), bg="white").pack(anchor="w")
+        self.group_agg_vars = {agg: tk.BooleanVar(value=agg == "count") for agg in GROUP_AGGREGATIONS}
+        for agg, var in self.group_agg_vars.items():
+            tk.Checkbutton(agg_frame, text=agg, variable=var, bg="white").pack(anchor="w")
+        pickers.grid_columnconfigure((0, 1), weight=1)
+        self.group_pivot_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.group_frame, text="Pivot: move the last key column into the columns",
+                       variable=self.group_pivot_var, bg="white").pack(pady=(5, 0))
+        group_buttons = tk.Frame(self.group_frame, bg="white")
+        group_buttons.pack(pady=5)
+        ttk.Button(group_buttons, text="Show Table", style="Glass.TButton",
+                   command=lambda: self.run_groupby(chart=False)).grid(row=0, column=0, padx=10)
+        ttk.Button(group_buttons, text="Show Chart", style="Glass.TButton",
+                   command=lambda: self.run_groupby(chart=True)).grid(row=0, column=1, padx=10)
+        self.group_status = tk.Label(self.group_frame, font=("Segoe UI", 10, "italic"), fg="gray", bg="white")
+        self.group_status.pack()
+        self.group_grid = DataGrid(self.group_frame, visible_rows=12, bg="white")
 
         self.visualize_section.pack_forget()
 
+        self.profile_section = tk.Frame(container, relief=tk.RIDGE, borderwidth=2, bg="white")
+        self._add_section_title(self.profile_section, "Column Profile", self.toggle_profile_section)
+        profile_bar = tk.Frame(self.profile_section, bg="white")
+        profile_bar.pack(fill="x", padx=15)
+        self.profile_status = tk.Label(profile_bar, font=("Segoe UI", 10), bg="white", anchor="w")
+        self.profile_status.pack(side="left", fill="x", expand=True)
+        self.profile_cancel_btn = ttk.Button(profile_bar, text="Cancel", command=self.cancel_profiling, state="disabled")
+        self.profile_cancel_btn.pack(side="right")
+        ttk.Button(profile_bar, text="Refresh", command=self.start_profiling).pack(side="right", padx=5)
+        profile_columns = (("column", "Column", 160), ("dtype", "Dtype", 100), ("count", "Non-null", 90),
+                           ("nulls", "Nulls", 80), ("distinct", "Distinct \u2248", 90), ("min", "Min", 110),
+                           ("max", "Max", 110), ("mean", "Mean", 90), ("std", "Std", 90), ("p25", "P25 \u2248", 90),
+                           ("p50", "Median \u2248", 90), ("p75", "P75 \u2248", 90), ("top", "Top Values", 260))
+        self.profile_tree = ttk.Treeview(self.profile_section, show="headings", height=12,
+                                         columns=[col_id for col_id, _, _ in profile_columns])
+        for col_id, heading, width in profile_columns:
+            self.profile_tree.heading(col_id, text=heading)
+            self.profile_tree.column(col_id, width=width, stretch=False,
+                                     anchor="w" if col_id in ("column", "dtype", "top") else "e")
+        profile_xscroll = ttk.Scrollbar(self.profile_section, orient="horizontal", command=self.profile_tree.xview)
+        self.profile_tree.configure(xscrollcommand=profile_xscroll.set)
+        self.profile_tree.pack(fill="both", expand=True, padx=15, pady=(8, 0))
+        profile_xscroll.pack(fill="x", padx=15, pady=(0, 8))
+        self.profile_section.pack_forget()
+
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
-        self.canvas_obj = None
+    def _add_load_options(self, parent):
+        frame = tk.Frame(parent, bg="white")
+        tk.Checkbutton(frame, text="Compact load (smaller dtypes, less memory)",
+                       variable=self.compact_load_var, bg="white").pack(anchor="w")
+        tk.Checkbutton(frame, text="Out-of-core mode (stream files larger than memory from disk)",
+                       variable=self.out_of_core_var, bg="white").pack(anchor="w")
+        tk.Checkbutton(frame, text="Add a \"source_file\" column when loading several files",
+                       variable=self.source_column_var, bg="white").pack(anchor="w")
+        return frame
+
+    def _add_column_picker(self, parent, title, column):
+        frame = tk.Frame(parent, bg="white")
+        frame.grid(row=0, column=column, sticky="nsew", padx=10)
+        tk.Label(frame, text=title, font=("Segoe UI", 10, "bold"), bg="white").pack(anchor="w")
+        listbox = tk.Listbox(frame, selectmode="multiple", exportselection=False, height=8, font=("Segoe UI", 10))
+        listbox.pack(fill="both", expand=True)
+        return listbox
 
     def _add_section_title(self, frame, title_text, close_command):
         title_frame = tk.Frame(frame, bg="white")
@@ -182,37 +842,172 @@ class CSVAnalyzerApp:
         close_btn.pack(side="right", padx=10)
 
     def load_csv(self):
-        file_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv")])
-        if not file_path:
+        if self._worker_busy():
+            return
+        file_paths = filedialog.askopenfilenames(filetypes=[("CSV Files", "*.csv")])
+        if not file_paths:
             return
         try:
-            self.df = pd.read_csv(file_path)
-            self.upload_frame.place_forget()
-            self.features_frame.pack(fill="both", expand=True, padx=15, pady=10)
-
-            self.columns_listbox.delete(0, tk.END)
-            for col in self.df.columns:
-                self.columns_listbox.insert(tk.END, col)
-
-            self.setup_checkboxes()
-            self.setup_row_entries()
-            self.setup_visualize_dropdown()
-
-            self.column_data_text.delete(1.0, tk.END)
-            for _, var in self.checkbox_vars:
-                var.set(False)
-            for var, entry in self.row_entry_widgets.values():
-                var.set(False)
-                entry.delete(0, tk.END)
-
-            for sec in [self.show_columns_section, self.show_column_data_section,
-                        self.add_column_section, self.add_row_section, self.visualize_section]:
-                sec.pack_forget()
-
-            messagebox.showinfo("Success", f"Loaded CSV with {len(self.df)} rows and {len(self.df.columns)} columns.")
+            self.loader = self.engine.loader(list(file_paths), compact=self.compact_load_var.get(),
+                                             out_of_core=self.out_of_core_var.get(),
+                                             source_column="source_file" if self.source_column_var.get() else None)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to load CSV:\n{e}")
+            return
+        operations.attach(self.loader, "load_csv")
+        self.load_columns_text = "reading header"
+        label = os.path.basename(file_paths[0]) if len(file_paths) == 1 else f"{len(file_paths)} files"
+        self._start_worker(self.loader, "Loading CSV", label, self.loader.total_bytes,
+                           "Reading header...", self._poll_loader)
+
+    def _worker_busy(self):
+        if self.worker is not None and self.worker.is_alive():
+            self.progress_dialog.lift()
+            return True
+        return False
+
+    def _start_worker(self, worker, title, label, maximum, status_text, poll):
+        self.worker = worker
+        self.progress_dialog = tk.Toplevel(self.root, bg="white")
+        self.progress_dialog.title(title)
+        self.progress_dialog.resizable(False, False)
+        self.progress_dialog.transient(self.root)
+        self.progress_dialog.protocol("WM_DELETE_WINDOW", self.cancel_worker)
+
+        tk.Label(self.progress_dialog, text=label, font=("Segoe UI", 12, "bold"),
+                 bg="white").pack(padx=20, pady=(15, 5))
+        self.progress_bar = ttk.Progressbar(self.progress_dialog, length=360, mode="determinate",
+                                            maximum=max(maximum, 1))
+        self.progress_bar.pack(padx=20, pady=5)
+        self.progress_label = tk.Label(self.progress_dialog, text=status_text,
+                                       font=("Segoe UI", 10), bg="white")
+        self.progress_label.pack(padx=20, pady=5)
+        ttk.Button(self.progress_dialog, text="Cancel", command=self.cancel_worker).pack(pady=(5, 15))
+        self.progress_dialog.grab_set()
+
+        worker.start()
+        self.root.after(100, poll)
+
+    def cancel_worker(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.progress_label.config(text="Cancelling...")
+
+    def _close_progress(self):
+        if self.progress_dialog is not None:
+            self.progress_dialog.grab_release()
+            self.progress_dialog.destroy()
+            self.progress_dialog = None
+
+    def _poll_loader(self):
+        loader = self.loader
+        try:
+            while True:
+                kind, payload = loader.messages.get_nowait()
+                if kind == "schema":
+                    self.load_columns_text = f"{len(payload)} columns"
+                elif kind == "status":
+                    self.progress_label.config(text=payload)
+                elif kind == "progress":
+                    rows, bytes_read = payload
+                    self.progress_bar["value"] = bytes_read
+                    self.progress_label.config(
+                        text=f"{rows:,} rows, {format_bytes(bytes_read)} of "
+                             f"{format_bytes(loader.total_bytes)} ({self.load_columns_text})")
+                elif kind == "done":
+                    operations.finish_job(loader, kind, rows=len(payload), bytes_read=loader.total_bytes)
+                    self._close_progress()
+                    self._on_csv_loaded(payload)
+                    return
+                elif kind == "cancelled":
+                    operations.finish_job(loader, kind)
+                    self._close_progress()
+                    return
+                elif kind == "error":
+                    operations.finish_job(loader, kind, payload)
+                    self._close_progress()
+                    messagebox.showerror("Error", f"Failed to load CSV:\n{payload}")
+                    return
+        except queue.Empty:
+            self.root.after(100, self._poll_loader)
+
+    def _on_csv_loaded(self, df):
+        try:
+            with operations.span("show_loaded_data", rows=len(df)):
+                self._show_loaded_data(df)
+            source = " from cache" if self.loader.from_cache else ""
+            messagebox.showinfo("Success", f"Loaded CSV{source} with {self.engine.row_count()} rows and "
+                                           f"{len(self.engine.columns())} columns.")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load CSV:\n{e}")
 
+    def _show_loaded_data(self, df):
+        self.engine.set_data(df, self.loader.memory_before)
+        self.update_memory_report()
+        self.upload_frame.place_forget()
+        self.features_frame.pack(fill="both", expand=True, padx=15, pady=10)
+        self.update_mode_label()
+
+        self.columns_listbox.delete(0, tk.END)
+        for col in self.engine.columns():
+            self.columns_listbox.insert(tk.END, col)
+
+        self.setup_checkboxes()
+        self.setup_row_entries()
+        self.setup_visualize_dropdown()
+        self.setup_filter_builder()
+        self.filter_entry.delete(0, tk.END)
+        self.update_filter_status()
+
+        self.column_grid.clear()
+
+        self.cancel_profiling()
+        for sec in [self.show_columns_section, self.show_column_data_section,
+                    self.add_column_section, self.add_row_section, self.visualize_section,
+                    self.profile_section]:
+            sec.pack_forget()
+
+    def _has_data(self):
+        if not self.engine.has_data:
+            messagebox.showwarning("Warning", "No CSV loaded.")
+            return False
+        return True
+
+    def _in_memory_only(self, feature):
+        try:
+            self.engine.require_in_memory(feature)
+        except ValueError as e:
+            messagebox.showinfo("Info", str(e))
+            return False
+        return True
+
+    def update_mode_label(self):
+        if self.engine.lazy_source is None:
+            self.mode_label.pack_forget()
+            return
+        peak = peak_memory_bytes()
+        self.mode_label.config(
+            text="Out-of-core mode: Show Column Data, charts and Export stream the file from disk; "
+                 "Add Column and Add Row are unavailable. "
+                 f"Peak memory: {format_bytes(peak) if peak is not None else 'n/a'}")
+        self.mode_label.pack(after=self.features_btn_frame, pady=(0, 5))
+
+    def update_memory_report(self):
+        self.memory_report.delete(*self.memory_report.get_children())
+        if self.engine.lazy_source is not None:
+            self.memory_label.config(text="Memory Usage: data stays on disk in out-of-core mode")
+            return
+        if self.engine.df is None:
+            return
+        report = self.engine.memory_report()
+        for row in report.itertuples(index=False):
+            before_text = format_bytes(row.before) if pd.notna(row.before) else "-"
+            self.memory_report.insert("", "end", values=(row.column, row.dtype, before_text, format_bytes(row.after)))
+        total = f"Memory Usage: {format_bytes(report['after'].sum())}"
+        if self.engine.memory_before is not None:
+            total += f" (default load estimated at {format_bytes(self.engine.memory_before.sum())})"
+        self.memory_label.config(text=total)
+
     def toggle_show_columns_section(self):
         self._toggle_section(self.show_columns_section)
 
@@ -228,44 +1023,201 @@ class CSVAnalyzerApp:
     def toggle_visualize_section(self):
         self._toggle_section(self.visualize_section)
 
+    def toggle_profile_section(self):
+        self._toggle_section(self.profile_section)
+        if self.profile_section.winfo_ismapped():
+            self.start_profiling()
+        else:
+            self.cancel_profiling()
+
     def _toggle_section(self, section):
         if section.winfo_ismapped():
             section.pack_forget()
         else:
             for sec in [self.show_columns_section, self.show_column_data_section, self.add_column_section,
-                        self.add_row_section, self.visualize_section]:
+                        self.add_row_section, self.visualize_section, self.profile_section]:
                 if sec != section:
                     sec.pack_forget()
             section.pack(fill="both", expand=True, padx=10, pady=5)
 
-    def setup_checkboxes(self):
-        for widget in self.checkbox_frame.winfo_children():
-            widget.destroy()
-        self.checkbox_vars.clear()
+    def start_profiling(self):
+        """Fills the profile table from the cache and profiles the remaining
+        columns in the background, updating each row as its result arrives."""
+        self.cancel_profiling()
+        if not self.engine.has_data or self._view() is None:
+            return
+        self.profile_tree.delete(*self.profile_tree.get_children())
+        missing = []
+        for col in self.engine.columns():
+            stats = self.engine.cached_profile(col)
+            self.profile_tree.insert("", "end", iid=col, values=self._profile_values(col, stats))
+            if stats is None:
+                missing.append(col)
+        if not missing:
+            self.profile_status.config(text="Profile up to date.")
+            return
+        self.profile_job = self.engine.profiler(missing)
+        operations.attach(self.profile_job, "profile_columns")
+        self.profile_status.config(text=f"Profiling {len(missing)} of {len(self.engine.columns())} columns...")
+        self.profile_cancel_btn.config(state="normal")
+        self.profile_job.start()
+        self.root.after(100, self._poll_profiler)
+
+    def cancel_profiling(self):
+        if self.profile_job is not None and self.profile_job.is_alive():
+            self.profile_job.cancel()
+            operations.finish_job(self.profile_job, "cancelled")
+            self.profile_status.config(text="Profiling cancelled.")
+        self.profile_job = None
+        self.profile_cancel_btn.config(state="disabled")
+
+    def _poll_profiler(self):
+        job = self.profile_job
+        if job is None:
+            return
+        try:
+            while True:
+                kind, payload = job.messages.get_nowait()
+                if kind == "column":
+                    col, stats = payload
+                    self.engine.store_profile(job, col, stats)
+                    if self.profile_tree.exists(col):
+                        self.profile_tree.item(col, values=self._profile_values(col, stats))
+                elif kind == "progress":
+                    self.profile_status.config(text=f"Profiling... {payload:,} of {job.total_rows:,} rows read")
+                elif kind in ("done", "cancelled", "error"):
+                    operations.finish_job(job, kind, payload, rows=job.total_rows)
+                    self.profile_job = None
+                    self.profile_cancel_btn.config(state="disabled")
+                    if kind == "done":
+                        self._show_profile_freshness()
+                    elif kind == "error":
+                        self.profile_status.config(text=f"Profiling failed: {payload}")
+                    return
+        except queue.Empty:
+            self.root.after(100, self._poll_profiler)
+
+    def _refresh_profile(self):
+        if self.profile_section.winfo_ismapped():
+            self.start_profiling()
+
+    def _show_profile_freshness(self):
+        """Status text for a finished profile. Rows still buffered by add_row
+        aren't in it; they are picked up on Refresh or when the buffer is
+        merged, rather than re-profiling every column after each row."""
+        pending = len(self.engine.pending_rows)
+        if pending:
+            self.profile_status.config(text=f"{pending:,} added row(s) not profiled yet; press Refresh to include them.")
+        else:
+            self.profile_status.config(text="Profile up to date.")
+
+    @staticmethod
+    def _profile_values(col, stats):
+        if stats is None:
+            return (col, "...") + ("",) * 11
+
+        def number(value):
+            return "" if value is None else f"{value:,.6g}"
+
+        top = ", ".join(f"{value} ({count:,})" for value, count in stats["top"])
+        return (col, stats["dtype"], f"{stats['count']:,}", f"{stats['nulls']:,}", f"{stats['distinct']:,}",
+                *(number(stats[key]) if stats["mean"] is not None else (stats[key] or "")
+                  for key in ("min", "max")),
+                *(number(stats[key]) for key in ("mean", "std", "p25", "p50", "p75")), top)
+
+    def setup_filter_builder(self):
+        cols = self.engine.columns() or []
+        self.filter_column_box["values"] = cols
+        if self.filter_column_var.get() not in cols:
+            self.filter_column_var.set(cols[0] if cols else "")
+
+    def add_filter_condition(self):
+        """Appends the builder's column-op-value condition to the query and applies it."""
+        if not self._has_data():
+            return
+        text = self.filter_value_entry.get().strip()
+        if not text:
+            messagebox.showwarning("Input Error", "Please enter a value for the condition.")
+            return
+        try:
+            condition = self.engine.filter_condition(self.filter_column_var.get(), self.filter_op_var.get(), text)
+        except ValueError as e:
+            messagebox.showwarning("Input Error", str(e))
+            return
+        query = self.filter_entry.get().strip()
+        self.filter_entry.delete(0, tk.END)
+        self.filter_entry.insert(0, f"{query} and {condition}" if query else condition)
+        self.filter_value_entry.delete(0, tk.END)
+        self.apply_filter()
+
+    def apply_filter(self):
+        if not self._has_data():
+            return
+        try:
+            with operations.span("apply_filter", rows=self.engine.row_count()):
+                self.engine.set_filter(self.filter_entry.get())
+        except ValueError as e:
+            messagebox.showwarning("Filter", str(e))
+            return
+        self._refresh_filtered_views()
+
+    def clear_filter(self):
+        self.filter_entry.delete(0, tk.END)
+        if self.engine.has_data:
+            self.engine.set_filter(None)
+            self._refresh_filtered_views()
+
+    def update_filter_status(self):
+        view = self._view() if self.engine.row_filter is not None else None
+        if view is None:
+            self.filter_status.config(text="")
+            return
+        self.filter_status.config(text=f"{len(view):,} of {self.engine.row_count():,} rows match; "
+                                       "the column data, charts, profile and export use only these rows.")
 
-        if self.df is None:
+    def _view(self):
+        """engine.view, reporting a filter that no longer applies after an edit
+        (the engine clears it); None in that case."""
+        try:
+            return self.engine.view
+        except ValueError as e:
+            messagebox.showwarning("Filter", str(e))
+            self.filter_entry.delete(0, tk.END)
+            self.update_filter_status()
+            return None
+
+    def _refresh_filtered_views(self):
+        """Re-shows whatever is on screen for the current filter."""
+        self.update_filter_status()
+        view = self._view()
+        if view is None:
             return
+        if self.column_grid.df is not None:
+            self.column_grid.set_data(view, self.column_grid.column_positions)
+        if self.chart_kind is not None:
+            self._render_chart()
+        self._refresh_profile()
 
-        cols = list(self.df.columns)
-        for i, col in enumerate(cols):
-            var = tk.BooleanVar(value=False)
-            cb = tk.Checkbutton(self.checkbox_frame, text=col, variable=var, bg="white")
-            cb.grid(row=i//3, column=i%3, sticky="w", padx=10, pady=5)
-            self.checkbox_vars.append((col, var))
+    @operations.traced()
+    def setup_checkboxes(self):
+        self.column_picker.set_columns(self.engine.columns() or [])
 
     def show_selected_column_data(self):
-        if self.df is None:
-            messagebox.showwarning("Warning", "No CSV loaded.")
+        if not self._has_data():
             return
 
-        selected_cols = [col for col, var in self.checkbox_vars if var.get()]
+        selected_cols = set(self.column_picker.selected())
         if not selected_cols:
             messagebox.showwarning("Warning", "Select at least one column.")
             return
 
-        display_df = self.df[selected_cols]
-        self.column_data_text.delete(1.0, tk.END)
-        self.column_data_text.insert(tk.END, display_df.to_string(index=True))
+        view = self._view()
+        if view is None:
+            return
+        with operations.span("show_column_data", rows=len(view)):
+            positions = [i for i, col in enumerate(view.columns) if col in selected_cols]
+            self.column_grid.set_data(view, positions)
+        self.update_mode_label()
 
     def add_column(self):
         col_name = self.new_col_name_entry.get().strip()
@@ -273,184 +1225,367 @@ class CSVAnalyzerApp:
         if not col_name:
             messagebox.showwarning("Input Error", "Please enter a column name.")
             return
-        if self.df is not None:
-            if col_name in self.df.columns:
-                messagebox.showwarning("Input Error", "Column already exists.")
+        if not self._in_memory_only("Adding columns"):
+            return
+        if self.engine.df is not None:
+            try:
+                with operations.span("add_column", rows=self.engine.row_count()):
+                    self.engine.add_column(col_name, default_val)
+                    self.columns_listbox.insert(tk.END, col_name)
+                    self.update_memory_report()
+                    self.column_picker.add_column(col_name)
+                    self.row_picker.add_column(col_name)
+                    self.add_chart_column(col_name)
+                    self.setup_filter_builder()
+                    self._refresh_profile()
+            except ValueError as e:
+                messagebox.showwarning("Input Error", str(e))
                 return
-            self.df[col_name] = default_val
-            messagebox.showinfo("Info", f"Added column '{col_name}'.")
-            self.columns_listbox.insert(tk.END, col_name)
-            self.setup_checkboxes()
-            self.setup_row_entries()
-            self.setup_visualize_dropdown()
             self.new_col_name_entry.delete(0, tk.END)
             self.new_col_default_entry.delete(0, tk.END)
+            messagebox.showinfo("Info", f"Added column '{col_name}'.")
 
+    @operations.traced()
     def setup_row_entries(self):
-        for widget in self.row_checkbox_frame.winfo_children():
-            widget.destroy()
-        self.row_entry_widgets.clear()
-        if self.df is None:
-            return
-        cols = list(self.df.columns)
-        for i, col in enumerate(cols):
-            frame = tk.Frame(self.row_checkbox_frame, bg="white")
-            frame.grid(row=i//2, column=i%2, sticky="w", padx=10, pady=5)
-            var = tk.BooleanVar(value=False)
-            cb = tk.Checkbutton(frame, text=col, variable=var, bg="white")
-            cb.pack(side="left")
-            entry = tk.Entry(frame, width=25)
-            entry.pack(side="left", padx=5)
-            self.row_entry_widgets[col] = (var, entry)
+        self.row_picker.set_columns(self.engine.columns() or [])
 
     def add_row(self):
-        if self.df is None:
-            messagebox.showwarning("Warning", "No CSV loaded.")
+        if not self._has_data() or not self._in_memory_only("Adding rows"):
             return
 
-        checked_cols = [col for col, (var, _) in self.row_entry_widgets.items() if var.get()]
-        if not checked_cols:
+        values = self.row_picker.selected_values()
+        if not values:
             messagebox.showwarning("Input Error", "Please select at least one column for new row data.")
             return
 
-        for col in checked_cols:
-            _, entry = self.row_entry_widgets[col]
-            if entry.get().strip() == "":
+        for col, value in values.items():
+            if value.strip() == "":
                 messagebox.showwarning("Input Error", f"Please enter data for column '{col}'.")
                 return
 
-        new_row = {}
-        for col, (var, entry) in self.row_entry_widgets.items():
-            if var.get():
-                new_row[col] = entry.get()
-            else:
-                new_row[col] = ""
-
-        new_row = {k: (v if v is not None else "") for k, v in new_row.items()}
-        self.df = pd.concat([self.df, pd.DataFrame([new_row])], ignore_index=True)
-
+        with operations.span("add_row", rows=1):
+            self.engine.add_row(values)
+        if not self.engine.pending_rows:
+            self._refresh_profile()
+        elif self.profile_section.winfo_ismapped() and self.profile_job is None:
+            self._show_profile_freshness()
+        self.row_picker.clear_selection()
         messagebox.showinfo("Info", "New row added.")
-        self.setup_checkboxes()
-        for var, entry in self.row_entry_widgets.values():
-            var.set(False)
-            entry.delete(0, tk.END)
 
     def export_csv(self):
-        if self.df is None:
-            messagebox.showwarning("Warning", "No CSV loaded.")
+        if not self._has_data() or self._worker_busy():
             return
-        file_path = filedialog.asksaveasfilename(defaultextension=".csv",
-                                                 filetypes=[("CSV Files", "*.csv")])
-        if not file_path:
+        filetypes = [("CSV Files", "*.csv"), ("Compressed CSV", "*.csv.gz *.csv.bz2 *.csv.xz")]
+        if HAS_PYARROW:
+            filetypes += [("Parquet Files", "*.parquet"), ("Feather Files", "*.feather")]
+        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=filetypes)
+        if not file_path or self._view() is None:
             return
-        try:
-            self.df.to_csv(file_path, index=False)
-            messagebox.showinfo("Success", f"Exported CSV to:\n{file_path}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save CSV:\n{e}")
+        exporter = self.engine.exporter(file_path)
+        operations.attach(exporter, "export")
+        self._start_worker(exporter, "Exporting Data", os.path.basename(file_path), exporter.total_rows,
+                           "Writing...", self._poll_exporter)
 
+    def _poll_exporter(self):
+        exporter = self.worker
+        try:
+            while True:
+                kind, payload = exporter.messages.get_nowait()
+                if kind == "progress":
+                    self.progress_bar["value"] = payload
+                    self.progress_label.config(text=f"{payload:,} of {exporter.total_rows:,} rows written")
+                elif kind == "done":
+                    operations.finish_job(exporter, kind, rows=exporter.total_rows,
+                                          bytes_read=getattr(exporter.source, "total_bytes", None))
+                    self._close_progress()
+                    self.update_mode_label()
+                    messagebox.showinfo("Success", f"Exported data to:\n{payload}")
+                    return
+                elif kind == "cancelled":
+                    operations.finish_job(exporter, kind)
+                    self._close_progress()
+                    return
+                elif kind == "error":
+                    operations.finish_job(exporter, kind, payload)
+                    self._close_progress()
+                    messagebox.showerror("Error", f"Failed to save file:\n{payload}")
+                    return
+        except queue.Empty:
+            self.root.after(100, self._poll_exporter)
+
+    @operations.traced()
     def setup_visualize_dropdown(self):
-        if self.visualize_label:
-            self.visualize_label.destroy()
-            self.visualize_label = None
-
-        if self.visualize_dropdown:
-            self.visualize_dropdown.destroy()
-            self.visualize_dropdown = None
+        """Resets the Visualize section for newly loaded data."""
+        self.cancel_chart()
+        self.chart_kind = None
+        self.chart_view.clear()
 
-        for widget in self.visualize_btn_frame.winfo_children():
-            widget.destroy()
-        for widget in self.visualize_canvas_frame.winfo_children():
-            widget.destroy()
-
-        if self.df is None:
+        cols = self.engine.columns()
+        if cols is None:
             return
 
-        self.visualize_buttons_title.pack_forget()
-        self.visualize_btn_frame.pack_forget()
-        self.visualize_canvas_frame.pack_forget()
-
-        cols = list(self.df.columns)
-        cols.insert(0, "All Columns")
-        self.visualize_column_var.set(cols[0])
-
-        self.visualize_label = ttk.Label(self.visualize_section, text="Select Column:", font=("Segoe UI", 12), background="white")
-        self.visualize_label.pack(pady=(5,0))
-        self.visualize_dropdown = ttk.OptionMenu(self.visualize_section, self.visualize_column_var, *cols)
+        for widget in (self.visualize_label, self.visualize_dropdown, self.visualize_buttons_title,
+                       self.visualize_btn_frame, self.time_column_frame, self.chart_status, self.chart_view,
+                       self.group_frame):
+            widget.pack_forget()
+        self.visualize_dropdown.set_columns(cols)
+        source = self.engine.source
+        dates = [] if isinstance(source, ChunkedCSV) else \
+            [col for col in cols if pd.api.types.is_datetime64_any_dtype(source[col])]
+        self.time_column_dropdown.set_columns(cols, dates[0] if dates else None)
+
+        self.visualize_label.pack(pady=(5, 0))
         self.visualize_dropdown.pack(pady=5)
-
         self.visualize_buttons_title.pack(pady=(10, 5))
         self.visualize_btn_frame.pack(pady=5)
-        bar_btn = ttk.Button(self.visualize_btn_frame, text="Bar Chart", command=self.show_bar_chart, style="Glass.TButton")
-        pie_btn = ttk.Button(self.visualize_btn_frame, text="Pie Chart", command=self.show_pie_chart, style="Glass.TButton")
-        bar_btn.grid(row=0, column=0, padx=10)
-        pie_btn.grid(row=0, column=1, padx=10)
-
-        self.visualize_canvas_frame.pack(fill="both", expand=True, padx=10, pady=10)
-
-    def show_bar_chart(self):
-        self._clear_canvas()
-        col = self.visualize_column_var.get()
-        if self.df is None:
-            messagebox.showwarning("Warning", "No CSV loaded.")
+        self.time_column_frame.pack(pady=(0, 5))
+        self.chart_status.config(text="")
+        self.chart_status.pack()
+        self.chart_view.pack(fill="both", expand=True, padx=10, pady=10)
+        self.setup_group_by()
+
+    def add_chart_column(self, col):
+        """Offers a newly added column to the chart and group-by pickers
+        without resetting them."""
+        self.visualize_dropdown.add_column(col)
+        self.time_column_dropdown.add_column(col)
+        for listbox in (self.group_key_list, self.group_value_list):
+            listbox.insert(tk.END, col)
+
+    @operations.traced()
+    def setup_group_by(self):
+        self.cancel_groupby()
+        self.group_grid.clear()
+        self.group_grid.pack_forget()
+        self.group_status.config(text="")
+        for listbox in (self.group_key_list, self.group_value_list):
+            listbox.delete(0, tk.END)
+            for col in self.engine.columns() or []:
+                listbox.insert(tk.END, col)
+        self.group_frame.pack(fill="x", padx=10, pady=(0, 10))
+
+    def run_groupby(self, chart):
+        """Aggregates the picked columns on a GroupByJob, or shows the cached result."""
+        if not self._has_data() or self._view() is None:
             return
-
-        if col == "All Columns":
-            counts = self.df.astype(str).apply(pd.Series.value_counts).sum(axis=1).sort_values(ascending=False).head(10)
-
-            fig, ax = plt.subplots(figsize=(8, 5))
-            counts.plot(kind="bar", ax=ax)
-            ax.set_title("Top 10 Values Across All Columns")
-            ax.set_ylabel("Count")
-            ax.set_xlabel("Value")
-        else:
-            if col not in self.df.columns:
-                messagebox.showwarning("Warning", f"Column '{col}' not found.")
+        self.cancel_groupby()
+        keys = [self.group_key_list.get(i) for i in self.group_key_list.curselection()]
+        values = [self.group_value_list.get(i) for i in self.group_value_list.curselection()]
+        aggregations = [agg for agg, var in self.group_agg_vars.items() if var.get()]
+        pivot = self.group_pivot_var.get()
+        result = self.engine.cached_groupby(keys, values, aggregations, pivot)
+        if result is not None:
+            self._show_groupby(result, chart)
+            return
+        try:
+            self.group_job = self.engine.groupby_job(keys, values, aggregations, pivot)
+        except ValueError as e:
+            messagebox.showwarning("Input Error", str(e))
+            return
+        self.group_job.show_chart = chart
+        operations.attach(self.group_job, "groupby")
+        self.group_status.config(text="Aggregating...")
+        self.group_job.start()
+        self.root.after(100, self._poll_groupby)
+
+    def cancel_groupby(self):
+        if self.group_job is not None:
+            self.group_job.cancel()
+            operations.finish_job(self.group_job, "cancelled")
+            self.group_job = None
+            self.group_status.config(text="")
+
+    def _poll_groupby(self):
+        job = self.group_job
+        if job is None:
+            return
+        try:
+            while True:
+                kind, payload = job.messages.get_nowait()
+                if kind == "progress":
+                    self.group_status.config(text=f"Aggregating... {payload:,} of {job.total_rows:,} rows")
+                elif kind in ("done", "cancelled", "error"):
+                    operations.finish_job(job, kind, payload, rows=job.total_rows)
+                    self.group_job = None
+                    self.group_status.config(text="")
+                    if kind == "done":
+                        self.engine.store_groupby(job, payload)
+                        self._show_groupby(payload, job.show_chart)
+                        self.update_mode_label()
+                    elif kind == "error":
+                        messagebox.showerror("Error", f"Aggregation failed:\n{payload}")
+                    return
+        except queue.Empty:
+            self.root.after(100, self._poll_groupby)
+
+    def _show_groupby(self, result, chart):
+        self.group_status.config(text=f"{len(result):,} groups")
+        if chart:
+            if result.empty:
+                messagebox.showinfo("Info", "No groups to chart.")
                 return
-            counts = self.df[col].value_counts().head(10)
-            fig, ax = plt.subplots(figsize=(8, 5))
-            counts.plot(kind="bar", ax=ax)
-            ax.set_title(f"Top 10 Values in '{col}'")
-            ax.set_ylabel("Count")
-            ax.set_xlabel(col)
+            self.cancel_chart()
+            self.chart_kind = None
+            self.chart_view.show(grouped_chart_data(result))
+            return
+        table = result.reset_index()
+        self.group_grid.set_data(table, range(len(table.columns)))
+        self.group_grid.pack(fill="both", expand=True, pady=(5, 0))
 
-        self._display_figure(fig)
+    def show_chart(self, kind):
+        if not self._has_data():
+            return
+        self.chart_kind = kind
+        self._render_chart()
 
-    def show_pie_chart(self):
-        self._clear_canvas()
+    def _on_chart_column_changed(self, *args):
+        """Debounces dropdown changes: only the last pick within 300 ms is charted."""
+        if self.chart_kind is None:
+            return
+        if self._chart_after_id is not None:
+            self.root.after_cancel(self._chart_after_id)
+        self._chart_after_id = self.root.after(300, self._render_chart)
+
+    def _on_time_column_changed(self, *args):
+        if self.chart_kind == "timeseries":
+            self._on_chart_column_changed()
+
+    def _render_chart(self):
+        """Shows the cached chart data, or computes it on a ChartJob."""
+        self._chart_after_id = None
+        self.cancel_chart()
+        kind = self.chart_kind
         col = self.visualize_column_var.get()
-        if self.df is None:
-            messagebox.showwarning("Warning", "No CSV loaded.")
+        col = None if col == "All Columns" else col
+        if col is None and kind != "bar":
+            messagebox.showinfo("Info", f"{CHART_NAMES[kind]} for all columns is not supported. "
+                                        "Please select a specific column.")
             return
-
-        if col == "All Columns":
-            messagebox.showinfo("Info", "Pie chart for all columns is not supported. Please select a specific column.")
+        if self._view() is None:
             return
-        if col not in self.df.columns:
-            messagebox.showwarning("Warning", f"Column '{col}' not found.")
+        buckets = max(200, self.chart_view.winfo_width()) if kind == "timeseries" else 1000
+        time_col = self.time_column_var.get()
+        time_col = None if time_col == ROW_ORDER else time_col
+        data = self.engine.cached_chart_data(kind, col, buckets=buckets, time_col=time_col)
+        if data is not None:
+            self.chart_view.show(data)
             return
-
-        counts = self.df[col].value_counts().head(10)
-        fig, ax = plt.subplots(figsize=(8, 5))
-        counts.plot(kind="pie", ax=ax, autopct='%1.1f%%', startangle=140)
-        ax.set_ylabel("")
-        ax.set_title(f"Distribution of '{col}'")
-        self._display_figure(fig)
-
-    def _display_figure(self, fig):
-        if self.canvas_obj:
-            self.canvas_obj.get_tk_widget().destroy()
-
-        self.canvas_obj = FigureCanvasTkAgg(fig, master=self.visualize_canvas_frame)
-        self.canvas_obj.draw()
-        self.canvas_obj.get_tk_widget().pack(fill="both", expand=True)
-        plt.close(fig)
-
-    def _clear_canvas(self):
-        for widget in self.visualize_canvas_frame.winfo_children():
-            widget.destroy()
+        try:
+            self.chart_job = self.engine.chart_job(kind, col, buckets=buckets, time_col=time_col)
+        except ValueError as e:
+            messagebox.showwarning("Warning", str(e))
+            return
+        operations.attach(self.chart_job, f"chart_{kind}")
+        self.chart_status.config(text=f"Computing {CHART_NAMES[kind].lower()}...")
+        self.chart_job.start()
+        self.root.after(100, self._poll_chart)
+
+    def cancel_chart(self):
+        if self.chart_job is not None:
+            self.chart_job.cancel()
+            operations.finish_job(self.chart_job, "cancelled")
+            self.chart_job = None
+            self.chart_status.config(text="")
+
+    def _poll_chart(self):
+        job = self.chart_job
+        if job is None:
+            return
+        try:
+            kind, payload = job.messages.get_nowait()
+        except queue.Empty:
+            self.root.after(100, self._poll_chart)
+            return
+        self.chart_job = None
+        self.chart_status.config(text="")
+        operations.finish_job(job, kind, payload, rows=len(job.source))
+        if kind == "done":
+            self.engine.store_chart_data(job, payload)
+            self.chart_view.show(payload)
+            self.update_mode_label()
+        elif kind == "error":
+            messagebox.showwarning("Warning", str(payload))
+
+    def _on_operation_finished(self, span):
+        # Spans finished on worker threads wait for the next one on the UI thread.
+        if threading.current_thread() is not threading.main_thread():
+            return
+        if span.parent is None:
+            self.last_operation_label.config(text=f"Last operation: {span.summary()}")
+        if self.ops_tree is not None:
+            self._insert_operation(span)
+
+    def show_operations_log(self):
+        """Opens (or raises) the window listing recorded operations, with the
+        profiling switches and trace export."""
+        if self.ops_window is not None:
+            self.ops_window.lift()
+            return
+        self.ops_window = tk.Toplevel(self.root, bg="white")
+        self.ops_window.title("Operations Log")
+        self.ops_window.protocol("WM_DELETE_WINDOW", self._close_operations_log)
+        toolbar = tk.Frame(self.ops_window, bg="white")
+        toolbar.pack(fill="x", padx=10, pady=5)
+        tk.Checkbutton(toolbar, text="Capture cProfile", variable=self.ops_profile_var, bg="white",
+                       command=lambda: setattr(operations, "profile", self.ops_profile_var.get())).pack(side="left")
+        tk.Checkbutton(toolbar, text="Trace allocations (tracemalloc, slower)", variable=self.ops_memory_var,
+                       bg="white", command=lambda: setattr(operations, "trace_memory", self.ops_memory_var.get())
+                       ).pack(side="left", padx=10)
+        ttk.Button(toolbar, text="Export Trace...", command=self.export_trace).pack(side="right")
+        ttk.Button(toolbar, text="Clear", command=self.clear_operations_log).pack(side="right", padx=5)
+        ops_columns = (("time", "Time", 70), ("operation", "Operation", 200), ("seconds", "Seconds", 80),
+                       ("rows", "Rows", 100), ("read", "Read", 90), ("peak", "Peak Memory +", 100),
+                       ("traced", "Allocated", 90), ("status", "Status", 160))
+        self.ops_tree = ttk.Treeview(self.ops_window, show="headings", height=18,
+                                     columns=[col_id for col_id, _, _ in ops_columns])
+        for col_id, heading, width in ops_columns:
+            self.ops_tree.heading(col_id, text=heading)
+            self.ops_tree.column(col_id, width=width, anchor="w" if col_id in ("time", "operation", "status") else "e")
+        self.ops_tree.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        for span in operations.spans:
+            self._insert_operation(span)
+
+    def _insert_operation(self, span):
+        depth, parent = 0, span.parent
+        while parent is not None:
+            depth, parent = depth + 1, parent.parent
+        status = span.status if span.error is None else f"{span.status}: {span.error}"
+        self.ops_tree.insert("", 0, values=(
+            datetime.fromtimestamp(span.started).strftime("%H:%M:%S"), "    " * depth + span.name,
+            f"{span.seconds:.3f}", "" if span.rows is None else f"{span.rows:,}",
+            "" if span.bytes_read is None else format_bytes(span.bytes_read),
+            format_bytes(span.peak_growth) if span.peak_growth else "",
+            "" if span.traced_peak is None else format_bytes(span.traced_peak),
+            status + (" (profiled)" if span.profile is not None else "")))
+
+    def _close_operations_log(self):
+        self.ops_window.destroy()
+        self.ops_window = None
+        self.ops_tree = None
+
+    def clear_operations_log(self):
+        operations.clear()
+        self.ops_tree.delete(*self.ops_tree.get_children())
+
+    def export_trace(self):
+        file_path = filedialog.asksaveasfilename(parent=self.ops_window, defaultextension=".json",
+                                                 filetypes=[("Chrome Trace", "*.json")])
+        if not file_path:
+            return
+        try:
+            written = operations.export_trace(file_path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to export trace:\n{e}", parent=self.ops_window)
+            return
+        profiles = f"\nand {len(written) - 1} cProfile file(s) beside it" if len(written) > 1 else ""
+        messagebox.showinfo("Success", f"Saved trace to:\n{file_path}{profiles}\n\n"
+                                       "Open it in chrome://tracing or ui.perfetto.dev.", parent=self.ops_window)
 
     def on_close(self):
+        operations.listeners.remove(self._on_operation_finished)
+        self.cancel_profiling()
+        self.cancel_chart()
+        self.cancel_groupby()
         self.root.destroy()
 
 if __name__ == "__main__":
@@ -0,0 +1,223 @@
+"""Checks of the engine's sketches, indexes and merges against plain pandas."""
+import os
+import stat
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import (AnalysisEngine, ChunkedCSV, ColumnIndex, DataFrameExporter, GroupAggregator, HeavyHitters,
+                    HyperLogLog, QuantileSketch, compute_chart_data, concat_frames, filter_positions,
+                    parse_simple_query, run_sync, top_values_across_columns)
+
+
+def mixed_frame(rows=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "int": rng.integers(0, 50, rows),
+        "float": np.round(rng.normal(100, 15, rows), 2),
+        "city": rng.choice(["Paris", "Rome", "Oslo", "Lima", "Pune"], rows, p=[0.4, 0.3, 0.15, 0.1, 0.05]),
+        "day": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 30, rows), unit="D"),
+        "flag": rng.random(rows) < 0.3,
+    })
+
+
+def chunks(data, n):
+    return [data.iloc[bounds[0]:bounds[-1] + 1] for bounds in np.array_split(np.arange(len(data)), n)]
+
+
+def exact_value_counts(df):
+    return pd.concat([df[col].astype(str) for col in df.columns]).value_counts()
+
+
+def test_heavy_hitters_keeps_every_frequent_key_within_the_error_bound():
+    rng = np.random.default_rng(1)
+    keys = pd.Series(np.concatenate([rng.zipf(1.5, 20000) % 5000, rng.integers(0, 50, 2000)])).astype(str)
+    sketch = HeavyHitters(capacity=100)
+    for chunk in chunks(keys, 10):
+        sketch.update(chunk.value_counts())
+    exact = keys.value_counts()
+    bound = sketch.total / (sketch.capacity + 1)
+    assert sketch.total == len(keys)
+    assert set(exact[exact > bound].index) <= set(sketch.counts.index)
+    difference = exact[sketch.counts.index] - sketch.counts
+    assert (difference >= 0).all() and (difference <= bound).all()
+
+
+@pytest.mark.parametrize("cardinality", [20, 100_000])
+def test_top_values_across_columns_matches_pandas(cardinality):
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({f"c{i}": rng.integers(0, cardinality, 20000) for i in range(6)})
+    got = top_values_across_columns(df, n=10, capacity=50)
+    expected = exact_value_counts(df)
+    assert not got.attrs.get("approximate")
+    assert got.tolist() == expected.head(10).tolist()
+    assert all(expected[value] == count for value, count in got.items())
+
+
+def test_top_values_across_columns_flags_approximate_counts_over_budget():
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({f"c{i}": rng.integers(0, 100_000, 20000) for i in range(6)})
+    assert top_values_across_columns(df, n=10, capacity=50, max_keys=100).attrs["approximate"]
+
+
+def test_hyperloglog_estimates_distinct_count():
+    values = pd.Series(np.random.default_rng(4).integers(0, 200_000, 300_000))
+    sketch = HyperLogLog()
+    for chunk in chunks(values, 7):
+        sketch.update(pd.util.hash_pandas_object(chunk, index=False).to_numpy())
+    assert sketch.estimate() == pytest.approx(values.nunique(), rel=0.05)
+
+
+def test_quantile_sketch_merge_tracks_numpy_quantiles():
+    values = np.random.default_rng(5).lognormal(3, 1, 200_000)
+    left, right = QuantileSketch(), QuantileSketch(seed=1)
+    for i, chunk in enumerate(np.array_split(values, 20)):
+        (left if i % 2 else right).update(chunk)
+    left.merge(right)
+    qs = [0.1, 0.25, 0.5, 0.75, 0.9]
+    ranks = np.searchsorted(np.sort(values), left.quantiles(qs)) / len(values)
+    assert np.abs(ranks - qs).max() < 0.02
+
+
+@pytest.mark.parametrize("expr", [
+    "int == 7", "int != 7", "int >= 45", "float < 80 and city == 'Rome'", "city in ['Oslo', 'Lima']",
+    "city not in ['Paris']", "day > '2024-01-20'", "flag == True", "`int` <= 3 and float > 100",
+    "int * 2 > 90", "flag == 1", "flag != 0", "flag in [True, True]", "int in [3, 3]", "int == 'x'",
+])
+def test_filter_positions_match_dataframe_query(expr):
+    df = mixed_frame()
+    indexes = {}
+    positions = filter_positions(df, expr, lambda col: indexes.setdefault(col, ColumnIndex(df[col])))
+    expected = np.flatnonzero(df.eval(expr).to_numpy())
+    np.testing.assert_array_equal(positions, expected)
+
+
+def test_timeseries_against_a_time_column_bins_min_max_by_time():
+    rng = np.random.default_rng(6)
+    df = pd.DataFrame({"when": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 10 ** 6, 20000), unit="s"),
+                       "value": rng.normal(size=20000)})
+    data = compute_chart_data(df, "timeseries", "value", buckets=100, time_col="when")
+    assert data["downsampled"] and data["rows"] == len(df)
+    ns = df["when"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    low, high = ns.min(), ns.max()
+    bucket = np.minimum(((ns - low) / (high - low) * 100).astype(np.int64), 99)
+    expected = df["value"].groupby(bucket).agg(["min", "max"])
+    np.testing.assert_allclose(data["y"][0::2][expected.index], expected["min"])
+    np.testing.assert_allclose(data["y"][1::2][expected.index], expected["max"])
+    small = compute_chart_data(df.head(50), "timeseries", "value", buckets=100, time_col="when")
+    np.testing.assert_array_equal(small["x"], np.sort(df["when"].head(50).to_numpy(dtype="datetime64[ns]")))
+
+
+def test_filter_positions_scans_when_no_index_is_offered():
+    df = mixed_frame()
+    positions = filter_positions(df, "int == 7 and city == 'Rome'", lambda col: None)
+    np.testing.assert_array_equal(positions, np.flatnonzero(((df["int"] == 7) & (df["city"] == "Rome")).to_numpy()))
+
+
+def test_parse_simple_query_rejects_what_it_cannot_index():
+    columns = ["a", "b c"]
+    assert parse_simple_query("a > 1 and `b c` == 'x'", columns) == [("a", ">", 1), ("b c", "==", "x")]
+    assert parse_simple_query("a > 1 or a < 0", columns) is None
+    assert parse_simple_query("a + 1 > 2", columns) is None
+    assert parse_simple_query("missing == 1", columns) is None
+
+
+def test_group_aggregator_merge_matches_pandas_groupby():
+    df = mixed_frame(8000)
+    df.loc[::11, "float"] = np.nan
+    df.loc[df["city"] == "Pune", "float"] = np.nan
+    aggregations = ["count", "sum", "mean", "min", "max", "nunique"]
+    parts = [GroupAggregator(["city"], ["float", "int"], aggregations).update(chunk)
+             for chunk in chunks(df, 4)]
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    got = merged.result()
+    expected = df.groupby("city")[["float", "int"]].agg(aggregations)
+    for col in ("float", "int"):
+        for agg in aggregations:
+            np.testing.assert_allclose(got[f"{col} {agg}"].to_numpy(dtype=float),
+                                       expected[(col, agg)].to_numpy(dtype=float), rtol=1e-9)
+
+
+def test_concat_frames_matches_pd_concat_and_reconciles_dtypes():
+    a = pd.DataFrame({"x": [1, 2], "cat": pd.Categorical(["p", "q"]), "only_a": [1, 2]})
+    b = pd.DataFrame({"x": [1.5, 2.5], "cat": pd.Categorical(["r", "p"])})
+    got = concat_frames([a.copy(), b.copy()], source_names=["a.csv", "b.csv"])
+    expected = pd.concat([a, b], ignore_index=True)
+    assert got["x"].dtype == np.float64 and got["x"].tolist() == expected["x"].tolist()
+    assert isinstance(got["cat"].dtype, pd.CategoricalDtype)
+    assert got["cat"].astype(str).tolist() == ["p", "q", "r", "p"]
+    assert got["only_a"].dtype == np.float64 and got["only_a"].isna().tolist() == [False, False, True, True]
+    assert got["source_file"].astype(str).tolist() == ["a.csv", "a.csv", "b.csv", "b.csv"]
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_chunked_csv_take_rows_matches_read_csv_with_blank_lines(tmp_path, newline):
+    lines = ["a,b"]
+    for i in range(57):
+        lines.append(f"{i},v{i}")
+        if i % 9 == 4:
+            lines.append("")
+    path = tmp_path / "data.csv"
+    path.write_bytes(newline.join(lines).encode())
+    expected = pd.read_csv(path)
+    source = ChunkedCSV(str(path), index_stride=5)
+    source.build_index(block_bytes=16)
+    assert len(source) == len(expected)
+    for start, stop in [(0, 3), (4, 11), (20, 25), (50, 57), (55, 80)]:
+        window = source.take_rows(start, stop, [0, 1])
+        pd.testing.assert_frame_equal(window, expected.iloc[start:stop], check_index_type=False)
+    counts = source.value_counts("b")
+    assert counts.sort_index().equals(expected["b"].value_counts().sort_index())
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_chunked_csv_index_ignores_newlines_inside_quotes(tmp_path, newline):
+    lines = ['id,"note\nheader"']
+    for i in range(40):
+        lines.append(f'{i},"line {i}{newline}{newline}more ""quoted"", text"' if i % 3 == 0 else f"{i},plain {i}")
+    path = tmp_path / "data.csv"
+    path.write_bytes((newline.join(lines) + newline).encode())
+    expected = pd.read_csv(path)
+    source = ChunkedCSV(str(path), index_stride=4)
+    source.build_index(block_bytes=7)
+    assert len(source) == len(expected) == 40
+    for start, stop in [(0, 5), (9, 14), (37, 40)]:
+        pd.testing.assert_frame_equal(source.take_rows(start, stop, [0, 1]), expected.iloc[start:stop],
+                                      check_index_type=False)
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permission bits")
+def test_export_keeps_the_mode_a_plain_write_would_give(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        path = tmp_path / "out.csv"
+        run_sync(DataFrameExporter(mixed_frame(10), str(path)))
+        assert stat.S_IMODE(path.stat().st_mode) == 0o644
+        path.chmod(0o640)
+        run_sync(DataFrameExporter(mixed_frame(10), str(path)))
+        assert stat.S_IMODE(path.stat().st_mode) == 0o640
+    finally:
+        os.umask(umask)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_add_row_keeps_column_dtypes(tmp_path, compact):
+    path = tmp_path / "data.csv"
+    mixed_frame(300).to_csv(path, index=False)
+    engine = AnalysisEngine()
+    engine.load(str(path), compact=compact)
+    dtypes = engine.df.dtypes.copy()
+    engine.add_row({"int": "999", "float": "1.5", "city": "Rome", "day": "2024-02-01", "flag": "true"})
+    engine.add_row({"int": "3"})
+    df = engine.source
+    assert len(df) == 302
+    for col in ("float", "city", "day"):
+        assert df[col].dtype == dtypes[col], col
+    assert pd.api.types.is_integer_dtype(df["int"])
+    assert pd.api.types.is_bool_dtype(df["flag"])
+    assert df["int"].iloc[-2:].tolist() == [999, 3]
+    assert df["float"].isna().iloc[-1]
+    assert engine.set_filter("int > 500") == 1
@@ -0,0 +1,239 @@
+"""Timing and memory spans around user operations.
+
+A span records wall time, rows processed, bytes read and how far the
+process's peak RSS grew while it ran; optionally it also records the
+tracemalloc peak and a cProfile of the code it ran. Finished spans go to a
+rolling log (and the "csv_analyzer.operations" logger), and the log can be
+written as a Chrome trace file (chrome://tracing, https://ui.perfetto.dev)
+with each span's profile saved beside it as a .prof file for pstats.
+
+Spans opened with `span()` nest per thread. Background jobs get a span from
+`attach()`, which profiles the job's thread, and close it with `finish_job()`
+when their last message arrives.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+from engine import format_bytes, peak_memory_bytes
+
+logger = logging.getLogger("csv_analyzer.operations")
+
+
+class Span:
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.thread = threading.get_ident()
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.seconds = None
+        self.rows = None
+        self.bytes_read = None
+        self.status = "running"
+        self.error = None
+        self._peak_before = peak_memory_bytes()
+        self.peak_growth = None
+        self.traced_peak = None
+        self._traced_start = None
+        self.profile = None
+        self._profiler = None
+
+    def summary(self):
+        parts = [f"{self.name}: {self.seconds:.3f} s"]
+        if self.rows is not None:
+            parts.append(f"{self.rows:,} rows")
+        if self.bytes_read is not None:
+            parts.append(f"{format_bytes(self.bytes_read)} read")
+        if self.peak_growth:
+            parts.append(f"peak memory +{format_bytes(self.peak_growth)}")
+        if self.traced_peak is not None:
+            parts.append(f"{format_bytes(self.traced_peak)} allocated at peak")
+        if self.status != "ok":
+            parts.append(self.status if self.error is None else f"{self.status}: {self.error}")
+        return ", ".join(parts)
+
+    def to_dict(self):
+        return {"name": self.name, "started": self.started, "seconds": self.seconds, "rows": self.rows,
+                "bytes_read": self.bytes_read, "peak_growth": self.peak_growth, "traced_peak": self.traced_peak,
+                "status": self.status, "error": None if self.error is None else str(self.error)}
+
+
+class Instrumentation:
+    """Opens and closes spans and keeps the last `max_spans` finished ones.
+
+    `profile` and `trace_memory` switch on cProfile and tracemalloc capture
+    for spans opened afterwards. tracemalloc is process-wide, so spans that
+    overlap in time share its peak. `listeners` are called with each finished
+    span on the thread that finished it.
+    """
+    def __init__(self, max_spans=500):
+        self.spans = deque(maxlen=max_spans)
+        self.profile = False
+        self.trace_memory = False
+        self.listeners = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._tracing = 0
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def begin(self, name):
+        stack = self._stack()
+        span = Span(name, parent=stack[-1] if stack else None)
+        if self.trace_memory:
+            with self._lock:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                self._tracing += 1
+                tracemalloc.reset_peak()
+                span._traced_start = tracemalloc.get_traced_memory()[0]
+        return span
+
+    def _start_profile(self, span):
+        # One profiler per thread: nested spans are covered by the outer one.
+        if not self.profile or getattr(self._local, "profiling", False):
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return
+        span._profiler = profiler
+        self._local.profiling = True
+
+    def _stop_profile(self, span):
+        if span._profiler is None:
+            return
+        span._profiler.disable()
+        self._local.profiling = False
+        span.profile = pstats.Stats(span._profiler)
+        span._profiler = None
+
+    def finish(self, span, status="ok", error=None, rows=None, bytes_read=None):
+        span.seconds = time.perf_counter() - span._start
+        span.status, span.error = status, error
+        if rows is not None:
+            span.rows = rows
+        if bytes_read is not None:
+            span.bytes_read = bytes_read
+        peak = peak_memory_bytes()
+        if peak is not None and span._peak_before is not None:
+            span.peak_growth = peak - span._peak_before
+        if span._traced_start is not None:
+            with self._lock:
+                span.traced_peak = max(tracemalloc.get_traced_memory()[1] - span._traced_start, 0)
+                self._tracing -= 1
+                if not self._tracing:
+                    tracemalloc.stop()
+        self.spans.append(span)
+        logger.info(span.summary())
+        for listener in self.listeners:
+            listener(span)
+        return span
+
+    @contextmanager
+    def span(self, name, rows=None, bytes_read=None):
+        """Times the enclosed block; set `rows`/`bytes_read` on the yielded span."""
+        span = self.begin(name)
+        span.rows, span.bytes_read = rows, bytes_read
+        stack = self._stack()
+        stack.append(span)
+        self._start_profile(span)
+        try:
+            yield span
+        except Exception as e:
+            self._stop_profile(span)
+            stack.pop()
+            self.finish(span, "error", e)
+            raise
+        self._stop_profile(span)
+        stack.pop()
+        self.finish(span)
+
+    def traced(self, name=None):
+        """Decorator running the function in a span named `name` (default: its name)."""
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name or func.__name__):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def attach(self, job, name):
+        """Opens a span for a background job (a Thread with `messages`) and
+        profiles its run() on the job's own thread; returns the span."""
+        span = job.span = self.begin(name)
+        run = job.run
+
+        def profiled_run():
+            self._start_profile(span)
+            try:
+                run()
+            finally:
+                self._stop_profile(span)
+        job.run = profiled_run
+        return span
+
+    def finish_job(self, job, kind, payload=None, rows=None, bytes_read=None):
+        """Closes the span of `job` for its final ("done", "cancelled" or "error") message."""
+        span = getattr(job, "span", None)
+        if span is None or span.seconds is not None:
+            return None
+        status = {"done": "ok"}.get(kind, kind)
+        return self.finish(span, status, payload if kind == "error" else None, rows, bytes_read)
+
+    def clear(self):
+        self.spans.clear()
+
+    def export_trace(self, path):
+        """Writes the log as a Chrome trace JSON file and each profiled span as
+        "<path stem>.<n>.<name>.prof"; returns the paths written."""
+        spans = list(self.spans)
+        if not spans:
+            raise ValueError("No operations have been recorded yet.")
+        origin = min(span.started for span in spans)
+        threads = {}
+        events = []
+        stem = os.path.splitext(path)[0]
+        written = [path]
+        for i, span in enumerate(spans):
+            args = {key: value for key, value in span.to_dict().items()
+                    if key not in ("name", "started", "seconds") and value is not None}
+            if span.profile is not None:
+                profile_path = f"{stem}.{i}.{span.name}.prof"
+                span.profile.dump_stats(profile_path)
+                written.append(profile_path)
+                args["profile"] = os.path.basename(profile_path)
+                args["top_functions"] = top_functions(span.profile)
+            events.append({"name": span.name, "ph": "X", "pid": os.getpid(),
+                           "tid": threads.setdefault(span.thread, len(threads)),
+                           "ts": (span.started - origin) * 1e6, "dur": span.seconds * 1e6, "args": args})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, indent=1)
+        return written
+
+
+def top_functions(stats, limit=15):
+    """The `limit` functions with the most cumulative time, as text lines."""
+    stream = io.StringIO()
+    pstats.Stats(stream=stream).add(stats).sort_stats("cumulative").print_stats(limit)
+    lines = stream.getvalue().splitlines()
+    start = next((i for i, line in enumerate(lines) if line.lstrip().startswith("ncalls")), len(lines))
+    return [line.rstrip() for line in lines[start:] if line.strip()]
+
+
+operations = Instrumentation()